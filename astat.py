@@ -1,15 +1,27 @@
 import os
 
+from kivy.clock import Clock
 from kivy.lang import Builder
 from kivymd.app import MDApp
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from views.screenmanager import MainScreenManager
 
-from models.base import Base
-from database import get_db_path, get_grades_as_object
+from diagnostics.sql import SQL_INSTRUMENTATION_ENV, sql_instrumentation
+from diagnostics.startup import startup_tracer
+from models.base import Base, configure_session
+from models.data_version import data_version
+from models.grade import grade_registry
+from models.writer import DatabaseWriter
+from database import (
+    create_db_engine,
+    get_db_path,
+    get_grades_as_object,
+    get_sql_log_path,
+    get_startup_trace_path,
+    migrate_db,
+)
 
 # Window.size = (400, 720)
 
@@ -21,29 +33,42 @@ class AStatApp(MDApp):
 
         db_path = get_db_path()
 
-        self.Session = self.init_db(db_path)
-
-        Builder.load_file("kv/selector.kv")
-        Builder.load_file("kv/barchart.kv")
-        Builder.load_file("kv/ascent-list-screen.kv")
-        Builder.load_file("kv/ascent-screen.kv")
-        Builder.load_file("kv/settings-screen.kv")
-        Builder.load_file("kv/location-screen.kv")
-        Builder.load_file("kv/statistic-screen.kv")
-        Builder.load_file("kv/statistic-filter-screen.kv")
-        Builder.load_file("kv/todoclimb-screen.kv")
-        Builder.load_file("kv/todolist-screen.kv")
-        Builder.load_file("kv/todolist-detail-screen.kv")
-        Builder.load_file("kv/todolist-add-screen.kv")
-        Builder.load_file("kv/screenmanager.kv")
-        return MainScreenManager()
+        with startup_tracer.phase("init_db"):
+            self.Session = self.init_db(db_path)
+
+        # The .kv files of the screens are loaded with the screens, on first
+        # navigation (see views.screenmanager.SCREENS)
+        with startup_tracer.phase("kv:kv/screenmanager.kv"):
+            Builder.load_file("kv/screenmanager.kv")
+        with startup_tracer.phase("screen manager"):
+            return MainScreenManager()
+
+    def on_start(self):
+        from kivy.core.window import Window
+
+        def on_first_frame(*args):
+            Window.unbind(on_flip=on_first_frame)
+            startup_tracer.mark_first_frame()
+            startup_tracer.save(get_startup_trace_path())
+
+        Window.bind(on_flip=on_first_frame)
 
     def get_db_session(self):
         return self.Session()
 
+    def get_db_writer(self):
+        return self.writer
+
+    def on_stop(self):
+        self.writer.stop()
+        if sql_instrumentation.enabled:
+            sql_instrumentation.dump(get_sql_log_path())
+
     def init_db(self, db_path):
-        DATABASE_URL = f"sqlite:///{db_path}"
-        engine = create_engine(DATABASE_URL, echo=False)
+        engine = create_db_engine(db_path)
+        self.engine = engine
+        if os.environ.get(SQL_INSTRUMENTATION_ENV):
+            sql_instrumentation.install(engine)
         session_factory = sessionmaker(bind=engine)
         Session = scoped_session(session_factory)
 
@@ -54,4 +79,20 @@ class AStatApp(MDApp):
                 session.add_all(grades)
                 session.commit()
 
+        # Bring existing databases up to the current schema version
+        migrate_db(engine)
+        data_version.bind(engine)
+        grade_registry.load(engine)
+
+        # Single thread writing the modifications of the database, its
+        # callbacks are run on the main thread
+        self.writer = DatabaseWriter(
+            sessionmaker(bind=engine, expire_on_commit=False),
+            dispatch=lambda function: Clock.schedule_once(
+                lambda dt: function()
+            ),
+        ).start()
+        # The models and the statistics read through the app's sessions
+        configure_session(self.get_db_session, self.writer)
+
         return Session
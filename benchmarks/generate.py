@@ -0,0 +1,241 @@
+"""
+Seeded generator of synthetic astat databases for the benchmarks.
+
+    python -m benchmarks.generate bench.db --ascents 100000 --seed 1
+
+The same seed and sizes always give the same database. The distributions
+mimic a real logbook:
+- grades around a personal level (7a) with a long tail of hard grades,
+flashes more frequent on easy grades,
+- dates over 15 years, with more ascents in the recent years and in the
+spring and autumn seasons,
+- areas with a long tail popularity (a few areas hold most ascents),
+- to-do lists of 5 to 60 climbs in up to 8 sectors, plus one large list.
+"""
+
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from database import (
+    GRADE_ASSOCIATION_DICT,
+    bulk_load,
+    create_db_engine,
+    migrate_db,
+)
+from database_local_management import import_ascents, initialize_empty_db
+from models.area import Area
+from models.sector import Sector
+from models.todoclimb import ToDoClimb
+from models.todolist import ToDoList
+
+SYLLABLES = [
+    "ba", "bel", "cor", "da", "del", "fa", "gra", "kan", "la", "lo", "ma",
+    "mor", "na", "no", "pa", "ra", "ro", "sa", "ser", "ta", "to", "va",
+    "ve", "zo",
+]
+WORDS = [
+    "Arete", "Bloc", "Crack", "Dalle", "Dihedral", "Roof", "Traverse",
+    "Prow", "Mantle", "Slab", "Pillar", "Wave", "Fissure", "Boulder",
+]
+TAGS = [None, "Project", "To Try", "To Check"]
+
+# grade_value by correspondence
+GRADES = {
+    correspondence: grade_value
+    for grade_value, correspondence in GRADE_ASSOCIATION_DICT.items()
+}
+FIRST_YEAR = 2010
+YEARS = 15
+# Relative number of ascents per month, January first
+MONTH_WEIGHTS = [3, 4, 8, 10, 9, 6, 4, 4, 8, 10, 8, 4]
+# Ascents per area of the generated databases, for their default size
+ASCENTS_PER_AREA = 250
+ASCENTS_PER_TODOLIST = 1000
+# Climbs of the large to-do list
+LARGE_TODOLIST_SIZE = 5000
+
+
+def get_default_area_count(ascents):
+    return max(1000, ascents // ASCENTS_PER_AREA)
+
+
+def get_default_todolist_count(ascents):
+    return max(100, ascents // ASCENTS_PER_TODOLIST)
+
+
+def random_name(rng, words=2):
+    name = "".join(
+        rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))
+    ).capitalize()
+    if words > 1:
+        name += " " + rng.choice(WORDS)
+    return name
+
+
+def random_grade(rng):
+    """Correspondence of a grade, around 7a with a tail of hard grades"""
+    correspondence = round(rng.gauss(7, 2.5))
+    if rng.random() < 0.05:
+        correspondence += rng.randint(2, 6)
+    return min(max(correspondence, 1), 19)
+
+
+def random_date(rng):
+    """Date of an ascent, more recent years and seasons being favored"""
+    # Triangular distribution: the number of ascents grows every year
+    year = FIRST_YEAR + int(rng.triangular(0, YEARS, YEARS))
+    year = min(year, FIRST_YEAR + YEARS - 1)
+    month = rng.choices(range(1, 13), weights=MONTH_WEIGHTS)[0]
+    return date(year, month, 1) + timedelta(days=rng.randint(0, 27))
+
+
+def generate_area_names(rng, count):
+    names = set()
+    while len(names) < count:
+        name = random_name(rng, words=1)
+        if name in names:
+            name = f"{name} {len(names)}"
+        names.add(name)
+    return sorted(names)
+
+
+def generate_ascents(rng, count, area_names):
+    """
+    Stream the ascents as the dictionaries read from a .csv (see
+    database_local_management.read_ascents_from_csv())
+    """
+    # Zipf-like popularity of the areas
+    area_weights = [1 / rank**1.1 for rank in range(1, len(area_names) + 1)]
+    shuffled_areas = list(area_names)
+    rng.shuffle(shuffled_areas)
+
+    for _ in range(count):
+        correspondence = random_grade(rng)
+        flash_probability = max(0.02, 0.4 - correspondence * 0.03)
+        yield {
+            "name": random_name(rng),
+            "grade": GRADES[correspondence],
+            "date": random_date(rng).isoformat(),
+            "area": rng.choices(shuffled_areas, weights=area_weights)[0],
+            "flash": rng.random() < flash_probability,
+            "note": (
+                " ".join(rng.choice(WORDS).lower() for _ in range(12))
+                if rng.random() < 0.2
+                else ""
+            ),
+        }
+
+
+def insert_todolists(connection, rng, count, grade_ids):
+    """Insert to-do lists with their sectors and climbs, the first one large"""
+    todolists = []
+    sectors = []
+    climbs = []
+    for todolist_id in range(1, count + 1):
+        todolists.append({"id": todolist_id, "name": random_name(rng)})
+        sector_ids = []
+        for _ in range(rng.randint(0, 8)):
+            sector_ids.append(len(sectors) + 1)
+            sectors.append(
+                {
+                    "id": len(sectors) + 1,
+                    "name": random_name(rng, words=1),
+                    "todolist_id": todolist_id,
+                }
+            )
+        size = LARGE_TODOLIST_SIZE if todolist_id == 1 else rng.randint(5, 60)
+        for _ in range(size):
+            climbs.append(
+                {
+                    "name": random_name(rng),
+                    "tag": rng.choice(TAGS),
+                    "grade_id": grade_ids[random_grade(rng)],
+                    "sector_id": (
+                        rng.choice(sector_ids)
+                        if sector_ids and rng.random() < 0.8
+                        else None
+                    ),
+                    "todolist_id": todolist_id,
+                    "star": rng.random() < 0.1,
+                    "note": "",
+                }
+            )
+
+    connection.execute(insert(ToDoList), todolists)
+    if sectors:
+        connection.execute(insert(Sector), sectors)
+    connection.execute(insert(ToDoClimb), climbs)
+    return len(climbs)
+
+
+def generate_db(db_path, ascents, seed=0, areas=None, todolists=None):
+    """
+    Create a synthetic database at db_path, replacing any existing file.
+
+    Parameters:
+    ascents: Number of ascents.
+    seed: Seed of the random generator.
+    areas, todolists: Number of areas and of to-do lists, proportional to
+    the number of ascents by default.
+    """
+    if areas is None:
+        areas = get_default_area_count(ascents)
+    if todolists is None:
+        todolists = get_default_todolist_count(ascents)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    rng = random.Random(seed)
+    engine = create_db_engine(db_path, profile="batch")
+    initialize_empty_db(engine)
+    migrate_db(engine)
+
+    with engine.begin() as connection:
+        grade_ids = dict(
+            connection.exec_driver_sql(
+                "SELECT correspondence, id FROM grade"
+            ).all()
+        )
+        # Created first so that the areas without ascents exist too
+        area_names = generate_area_names(rng, areas)
+        connection.execute(
+            insert(Area), [{"name": name} for name in area_names]
+        )
+        with bulk_load(connection):
+            import_ascents(
+                connection, generate_ascents(rng, ascents, area_names)
+            )
+        insert_todolists(connection, rng, todolists, grade_ids)
+
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic astat database"
+    )
+    parser.add_argument("db")
+    parser.add_argument("--ascents", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--areas", type=int)
+    parser.add_argument("--todolists", type=int)
+    arguments = parser.parse_args(argv)
+    generate_db(
+        arguments.db,
+        arguments.ascents,
+        seed=arguments.seed,
+        areas=arguments.areas,
+        todolists=arguments.todolists,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Check the cold-start import time of the app against a budget.
+
+    python -m benchmarks.import_budget                 # check every budget
+    python -m benchmarks.import_budget --module cli    # check one module
+    python -m benchmarks.import_budget --update --module cli
+
+The budgets, in seconds per module, are in import_budget.json. They are
+checked by tests/test_import_budget.py only when the ASTAT_IMPORT_BUDGET
+environment variable is set, wall-clock times depending on the machine.
+Every module is imported in new
+Python processes and the fastest run is kept. The check fails (exit status
+1) when it is slower than its budget by more than the threshold. The
+heaviest modules are then listed from a separate 'python -X importtime' run,
+whose own overhead would inflate the measured time, to find the imports to
+defer.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "import_budget.json")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+# Prints the import time of the module given as argument
+IMPORT_SCRIPT = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "__import__(sys.argv[1])\n"
+    "print(time.perf_counter() - start)\n"
+)
+# Prints the modules loaded by the import of the module given as argument
+MODULES_SCRIPT = (
+    "import sys\n"
+    "__import__(sys.argv[1])\n"
+    "print('\\n'.join(sorted(sys.modules)))\n"
+)
+
+
+class MissingDependencyError(Exception):
+    """The module can not be imported, one of its dependencies is missing"""
+
+
+def run_import(module, *options, script=IMPORT_SCRIPT):
+    """
+    Import module in a new Python process
+    :return: the completed process
+    """
+    process = subprocess.run(
+        [sys.executable, *options, "-c", script, module],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        if "ModuleNotFoundError" in process.stderr:
+            raise MissingDependencyError(process.stderr.splitlines()[-1])
+        raise RuntimeError(f"import {module} failed:\n{process.stderr}")
+    return process
+
+
+def measure_import(module, repeat=DEFAULT_REPEAT):
+    """:return: the fastest import time of module in seconds"""
+    return min(
+        float(run_import(module).stdout.split()[-1]) for _ in range(repeat)
+    )
+
+
+def get_imported_modules(module):
+    """:return: the names of every module loaded by the import of module"""
+    return set(run_import(module, script=MODULES_SCRIPT).stdout.split())
+
+
+def get_module_import_times(module):
+    """
+    :return: the cumulative import time in seconds of every module imported
+    with module, by name, from 'python -X importtime'
+    """
+    process = run_import(module, "-X", "importtime")
+    modules = {}
+    # Lines of -X importtime: 'import time: self | cumulative | module'
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def get_heaviest_modules(modules, count):
+    """
+    :return: the top level packages and the modules of the app with the
+    longest cumulative import time, as (name, seconds)
+    """
+    app_packages = {
+        name.split(".")[0]
+        for name in os.listdir(ROOT_DIR)
+        if name.endswith(".py") or os.path.isdir(os.path.join(ROOT_DIR, name))
+    }
+    candidates = {
+        name: duration
+        for name, duration in modules.items()
+        if "." not in name or name.split(".")[0] in app_packages
+    }
+    return sorted(candidates.items(), key=lambda item: -item[1])[:count]
+
+
+def load_budgets(path=BUDGET_PATH):
+    """:return: the import time budget in seconds of each module, by name"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as budget_file:
+        return json.load(budget_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the import time of the app against a budget"
+    )
+    parser.add_argument(
+        "--module",
+        action="append",
+        help="module to check, can be repeated (default: every module of "
+        "the budget file)",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slow down allowed over the budget (default: 0.2)",
+    )
+    parser.add_argument("--budget", default=BUDGET_PATH)
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="record the current import time as the budget of the modules",
+    )
+    parser.add_argument("--top", type=int, default=15)
+    arguments = parser.parse_args(argv)
+
+    budgets = load_budgets(arguments.budget)
+    modules = arguments.module or sorted(budgets)
+    if not modules:
+        sys.exit(f"no budget in {arguments.budget}, use --update --module")
+
+    failed = False
+    for module in modules:
+        try:
+            import_time = measure_import(module, arguments.repeat)
+        except MissingDependencyError as error:
+            print(f"import {module}: skipped ({error})")
+            continue
+        print(f"import {module}: {import_time * 1000:.1f} ms")
+        for name, duration in get_heaviest_modules(
+            get_module_import_times(module), arguments.top
+        ):
+            print(f"  {duration * 1000:8.1f} ms  {name}")
+
+        if arguments.update:
+            budgets[module] = round(import_time, 4)
+        elif module not in budgets:
+            print(f"  no budget, run with --update --module {module}")
+        else:
+            limit = budgets[module] * (1 + arguments.threshold)
+            if import_time > limit:
+                print(
+                    f"  over budget: {import_time * 1000:.1f} ms > "
+                    f"{limit * 1000:.1f} ms",
+                    file=sys.stderr,
+                )
+                failed = True
+            else:
+                print(f"  within budget ({limit * 1000:.1f} ms)")
+
+    if arguments.update:
+        with open(arguments.budget, "w", encoding="utf-8") as budget_file:
+            json.dump(budgets, budget_file, indent=2, sort_keys=True)
+            budget_file.write("\n")
+        print(f"budget saved to {arguments.budget}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Performance benchmarks of astat on synthetic databases.
+
+    python -m benchmarks.run --sizes 10000 100000 -o baseline.json
+    python -m benchmarks.run --sizes 10000 100000 --compare baseline.json
+
+The databases are generated once per size and seed (see
+benchmarks.generate) in benchmarks/data/. Every benchmark is run several
+times and its minimum and median times are recorded. With --compare, the
+minimum times, the least noisy, are compared to a previous result file and
+the command fails when one of them is slower by more than the threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+import statistic.queries
+from benchmarks.generate import generate_db
+from database import create_db_engine, migrate_db
+from database_local_management import (
+    initialize_empty_db,
+    load_ascents_to_csv,
+    load_ascents_to_db,
+)
+from models.area import Area
+from models.ascent import Ascent
+from models.base import configure_session, get_session
+from models.data_version import data_version
+from models.grade import Grade, grade_registry
+from models.todoclimb import ToDoClimb
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_SIZES = [10000, 100000, 1000000]
+# Functions of statistic/queries.py, called with the default filters
+STATISTICS_FUNCTIONS = [
+    "get_statistics",
+    "get_total_ascent",
+    "get_area_data",
+    "get_grade_data",
+    "get_year_data",
+    "get_average_grade",
+]
+
+
+def measure(function, repeat, setup=None):
+    """
+    Time function repeat times, setup being called before each run. A first
+    run, not timed, warms up the caches of SQLite and of the OS.
+    :return: a dictionary of the minimum and median times in seconds
+    """
+    times = []
+    for run in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        if run:
+            times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times)}
+
+
+def get_db(size, seed):
+    """:return: the path of the database of size ascents, generated once"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = os.path.join(DATA_DIR, f"astat-{size}-{seed}.db")
+    if not os.path.exists(db_path):
+        print(f"generating {db_path}", file=sys.stderr)
+        generate_db(db_path, size, seed=seed)
+    return db_path
+
+
+def benchmark_statistics(results, repeat):
+    """Every statistics function, computed without the cache"""
+    cache = statistic.queries.statistics_engine.cache
+    for name in STATISTICS_FUNCTIONS:
+        function = getattr(statistic.queries, name)
+        results[f"statistics.{name}"] = measure(
+            function, repeat, setup=cache.clear
+        )
+
+    with get_session() as session:
+        area = session.scalar(
+            select(Area.name)
+            .join(Ascent)
+            .group_by(Area.id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+    results["statistics.get_statistics.area_filter"] = measure(
+        lambda: statistic.queries.get_statistics(
+            min_grade_correspondence=5, max_grade_correpondence=12, area=area
+        ),
+        repeat,
+        setup=cache.clear,
+    )
+
+
+def benchmark_ascent_list(results, repeat, Session):
+    """The queries loading the pages of the AscentListScreen"""
+
+    def load_pages(query, by_grade, pages):
+        with Session() as session:
+            after = None
+            for _ in range(pages):
+                rows = Ascent.list_page(
+                    session, query, by_grade=by_grade, after=after
+                )
+                if not rows:
+                    break
+                after = Ascent.list_sort_key(rows[-1], by_grade)
+
+    for by_grade, sort in ((False, "date"), (True, "grade")):
+        results[f"ascent_list.first_page.by_{sort}"] = measure(
+            lambda: load_pages(Ascent.list_query(), by_grade, 1), repeat
+        )
+        results[f"ascent_list.10_pages.by_{sort}"] = measure(
+            lambda: load_pages(Ascent.list_query(), by_grade, 10), repeat
+        )
+    results["ascent_list.search"] = measure(
+        lambda: load_pages(Ascent.list_query(search_text="ba"), False, 1),
+        repeat,
+    )
+    results["ascent_list.search_in_note"] = measure(
+        lambda: load_pages(
+            Ascent.list_query(search_text="crack", in_note=True), False, 1
+        ),
+        repeat,
+    )
+
+
+def benchmark_todolist_detail(results, repeat, Session):
+    """The query loading the ToDoListDetailScreen, on the largest list"""
+    with Session() as session:
+        todolist_id = session.scalar(
+            select(ToDoClimb.todolist_id)
+            .group_by(ToDoClimb.todolist_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+
+    def load_climbs():
+        query = ToDoClimb.list_query(todolist_id).order_by(
+            Grade.correspondence.desc(), ToDoClimb.name
+        )
+        with Session() as session:
+            session.execute(query).all()
+
+    results["todolist_detail.by_grade"] = measure(load_climbs, repeat)
+
+
+def benchmark_csv(results, repeat, engine, work_dir):
+    """Export of every ascent, then import of the exported file"""
+    csv_path = os.path.join(work_dir, "ascents.csv")
+    results["csv.export"] = measure(
+        lambda: load_ascents_to_csv(engine, csv_path), repeat
+    )
+
+    def create_empty_db():
+        import_path = os.path.join(work_dir, "import.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(import_path + suffix):
+                os.remove(import_path + suffix)
+        import_engine = create_db_engine(import_path, profile="batch")
+        initialize_empty_db(import_engine)
+        migrate_db(import_engine)
+        import_engines.append(import_engine)
+
+    import_engines = []
+    results["csv.import"] = measure(
+        lambda: load_ascents_to_db(import_engines[-1], csv_path),
+        repeat,
+        setup=create_empty_db,
+    )
+    for import_engine in import_engines:
+        import_engine.dispose()
+
+
+def benchmark_area_delete(results, repeat, db_path, work_dir):
+    """Deletion of the area with the most ascents, on a copy of the db"""
+    copy_path = os.path.join(work_dir, "delete.db")
+    state = {}
+
+    def copy_db():
+        if "engine" in state:
+            state["engine"].dispose()
+        shutil.copy(db_path, copy_path)
+        engine = create_db_engine(copy_path, profile="batch")
+        configure_session(sessionmaker(bind=engine, expire_on_commit=False))
+        with engine.connect() as connection:
+            state["area_id"] = connection.execute(
+                select(Ascent.area_id)
+                .group_by(Ascent.area_id)
+                .order_by(func.count().desc())
+                .limit(1)
+            ).scalar()
+        state["engine"] = engine
+
+    results["area.delete"] = measure(
+        lambda: Area.delete(state["area_id"]).result(),
+        repeat,
+        setup=copy_db,
+    )
+    state["engine"].dispose()
+
+
+def run_benchmarks(db_path, repeat):
+    """:return: the results of every benchmark on a database, by name"""
+    results = {}
+    engine = create_db_engine(db_path, profile="batch")
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+    configure_session(Session)
+    grade_registry.load(engine)
+    data_version.bind(engine)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        benchmark_statistics(results, repeat)
+        benchmark_ascent_list(results, repeat, Session)
+        benchmark_todolist_detail(results, repeat, Session)
+        benchmark_csv(results, repeat, engine, work_dir)
+        data_version.close()
+        engine.dispose()
+        benchmark_area_delete(results, repeat, db_path, work_dir)
+
+    return results
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Print the minimum times against the ones of a baseline
+    :return: the names of the benchmarks slower by more than threshold, and
+    by more than min_delta seconds (shorter differences are noise)
+    """
+    regressions = []
+    for size, size_results in results["results"].items():
+        baseline_results = baseline["results"].get(size, {})
+        for name, result in sorted(size_results.items()):
+            if name not in baseline_results:
+                print(f"{size:>8} {name:<45} {'new':>8}")
+                continue
+            baseline_time = baseline_results[name]["min"]
+            ratio = result["min"] / baseline_time
+            flag = ""
+            if (
+                ratio > 1 + threshold
+                and result["min"] - baseline_time > min_delta
+            ):
+                regressions.append(f"{size} {name}")
+                flag = " REGRESSION"
+            print(f"{size:>8} {name:<45} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the astat benchmarks")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="numbers of ascents of the databases",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="JSON file of the results")
+    parser.add_argument("--compare", help="JSON file of a baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="relative slow down reported as a regression (default: 0.2)",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.001,
+        help="slow down in seconds below which a difference is ignored "
+        "(default: 0.001)",
+    )
+    arguments = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": arguments.seed,
+            "repeat": arguments.repeat,
+        },
+        "results": {},
+    }
+    for size in arguments.sizes:
+        db_path = get_db(size, arguments.seed)
+        print(f"benchmarking {size} ascents", file=sys.stderr)
+        results["results"][str(size)] = run_benchmarks(
+            db_path, arguments.repeat
+        )
+
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+            output.write("\n")
+
+    if arguments.compare:
+        with open(arguments.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(
+            results, baseline, arguments.threshold, arguments.min_delta
+        )
+        if regressions:
+            print(
+                f"{len(regressions)} regression(s) above "
+                f"{arguments.threshold:.0%}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+    elif not arguments.output:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
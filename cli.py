@@ -0,0 +1,322 @@
+"""
+Command-line interface of astat, to manage a database without the app.
+
+    python cli.py import astat.db ascents.csv [--new-only]
+    python cli.py export astat.db ascents.csv.gz [--area ...]
+    python cli.py stats astat.db [--format json|csv]
+    python cli.py migrate astat.db [--rebuild-statistics]
+    python cli.py vacuum astat.db
+
+Neither kivy nor kivymd are imported. The timings are printed on stderr so
+the output of 'stats' can be piped.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+from database import (
+    GRADE_ASSOCIATION_DICT,
+    CONNECTION_PROFILES,
+    create_db_engine,
+    migrate_db,
+    vacuum_db,
+)
+from database_local_management import (
+    initialize_empty_db,
+    load_ascents_to_csv,
+    load_ascents_to_db,
+    load_new_ascents_to_db,
+    rebuild_statistics,
+)
+from statistic.engine import StatisticsEngine, StatisticsFilter
+
+
+@contextmanager
+def timed(label):
+    """Print the time spent in the block on stderr"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed:.3f} s", file=sys.stderr)
+
+
+def report(message):
+    print(message, file=sys.stderr)
+
+
+def grade_correspondence(grade_value):
+    """argparse type of the grade options, e.g. '7a+' -> 8"""
+    if grade_value not in GRADE_ASSOCIATION_DICT:
+        raise argparse.ArgumentTypeError(f"unknown grade '{grade_value}'")
+    return GRADE_ASSOCIATION_DICT[grade_value]
+
+
+def open_db(arguments, create=False):
+    """
+    Create the engine of the database given as argument and bring it up to
+    the current schema version
+    """
+    exists = os.path.exists(arguments.db)
+    if not exists and not create:
+        raise SystemExit(f"astat: no database at '{arguments.db}'")
+
+    engine = create_db_engine(arguments.db, profile=arguments.profile)
+    if not exists:
+        with timed("create"):
+            initialize_empty_db(engine)
+    with timed("migrate"):
+        applied = migrate_db(engine)
+    if applied:
+        report(f"schema upgraded to version {applied[-1]}")
+    return engine
+
+
+def run_import(arguments):
+    engine = open_db(arguments, create=not arguments.dry_run)
+
+    def progress(count):
+        if arguments.verbose:
+            report(f"{count} ascents read")
+
+    with timed("import"):
+        if arguments.new_only or arguments.update_changed:
+            summary = load_new_ascents_to_db(
+                engine,
+                arguments.csv,
+                update_changed=arguments.update_changed,
+                dry_run=arguments.dry_run,
+                progress=progress,
+            )
+            report(
+                f"{summary.read} read, {summary.inserted} inserted, "
+                f"{summary.updated} updated, {summary.unchanged} unchanged, "
+                f"{summary.duplicates} duplicates, "
+                f"{summary.areas_created} areas created"
+            )
+        else:
+            imported = load_ascents_to_db(
+                engine, arguments.csv, progress=progress
+            )
+            report(f"{imported} ascents imported")
+    engine.dispose()
+
+
+def run_export(arguments):
+    engine = open_db(arguments)
+    with timed("export"):
+        exported = load_ascents_to_csv(
+            engine,
+            arguments.csv,
+            area=arguments.area,
+            min_grade_correspondence=arguments.min_grade,
+            max_grade_correspondence=arguments.max_grade,
+            start_date=arguments.start_date,
+            end_date=arguments.end_date,
+        )
+    report(f"{exported} ascents exported")
+    engine.dispose()
+
+
+def get_statistics_report(statistics, filter):
+    """:return: the statistics as a dictionary of JSON compatible values"""
+
+    def breakdown(rows, key):
+        return [
+            {key: value, "ascents": ascents, "flash": flash}
+            for value, ascents, flash in rows
+        ]
+
+    return {
+        "filter": filter._asdict(),
+        "total_ascents": statistics.total_ascents,
+        "total_flash": statistics.total_flash,
+        "average_grade": statistics.average_grade,
+        "average_flash_grade": statistics.average_flash_grade,
+        "grades": breakdown(statistics.grade_data, "grade"),
+        "years": breakdown(statistics.year_data, "year"),
+        "areas": breakdown(statistics.area_data, "area"),
+    }
+
+
+def write_statistics_csv(statistics, output):
+    """
+    Write the statistics as .csv rows (section;value;ascents;flash), the
+    averages in the 'ascents' column
+    """
+    writer = csv.writer(output, delimiter=";")
+    writer.writerow(("section", "value", "ascents", "flash"))
+    writer.writerow(
+        ("total", "", statistics.total_ascents, statistics.total_flash)
+    )
+    writer.writerow(
+        (
+            "average",
+            "",
+            statistics.average_grade or "",
+            statistics.average_flash_grade or "",
+        )
+    )
+    for section, rows in (
+        ("grade", statistics.grade_data),
+        ("year", statistics.year_data),
+        ("area", statistics.area_data),
+    ):
+        writer.writerows((section, *row) for row in rows)
+
+
+def run_stats(arguments):
+    engine = open_db(arguments)
+    filter = StatisticsFilter(
+        min_grade_correspondence=arguments.min_grade or 1,
+        max_grade_correspondence=arguments.max_grade or 19,
+        area=arguments.area or "All",
+    )
+    statistics_engine = StatisticsEngine(sessionmaker(bind=engine), filter)
+    with timed("stats"):
+        statistics = statistics_engine.get_statistics()
+    engine.dispose()
+
+    output = (
+        open(arguments.output, "w", encoding="utf-8", newline="")
+        if arguments.output
+        else sys.stdout
+    )
+    try:
+        if arguments.format == "csv":
+            write_statistics_csv(statistics, output)
+        else:
+            json.dump(
+                get_statistics_report(statistics, filter), output, indent=2
+            )
+            output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def run_migrate(arguments):
+    engine = open_db(arguments)
+    if arguments.rebuild_statistics:
+        with timed("rebuild statistics"):
+            rebuild_statistics(engine)
+    engine.dispose()
+
+
+def run_vacuum(arguments):
+    engine = open_db(arguments)
+    size = os.path.getsize(arguments.db)
+    with timed("vacuum"):
+        vacuum_db(engine)
+    engine.dispose()
+    report(f"{size} -> {os.path.getsize(arguments.db)} bytes")
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="python cli.py",
+        description="Manage an astat database without the app"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(CONNECTION_PROFILES),
+        default="batch",
+        help="SQLite connection profile (default: batch)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="report the progress"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser(
+        "import",
+        help="import the ascents of a .csv (or .csv.gz), creating the "
+        "database if needed",
+    )
+    import_parser.add_argument("db")
+    import_parser.add_argument("csv")
+    import_parser.add_argument(
+        "--new-only",
+        action="store_true",
+        help="skip the ascents already in the database",
+    )
+    import_parser.add_argument(
+        "--update-changed",
+        action="store_true",
+        help="update the flash and note of the ascents already in the "
+        "database (implies --new-only)",
+    )
+    import_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="only report what would be imported (implies --new-only)",
+    )
+    import_parser.set_defaults(function=run_import)
+
+    export_parser = subparsers.add_parser(
+        "export", help="export the ascents to a .csv (or .csv.gz)"
+    )
+    export_parser.add_argument("db")
+    export_parser.add_argument("csv")
+    export_parser.add_argument("--start-date", type=date.fromisoformat)
+    export_parser.add_argument("--end-date", type=date.fromisoformat)
+    export_parser.set_defaults(function=run_export)
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="compute the statistics of the ascents"
+    )
+    stats_parser.add_argument("db")
+    stats_parser.add_argument(
+        "--format", choices=("json", "csv"), default="json"
+    )
+    stats_parser.add_argument(
+        "-o", "--output", help="output file (default: stdout)"
+    )
+    stats_parser.set_defaults(function=run_stats)
+
+    for filtered_parser in (export_parser, stats_parser):
+        filtered_parser.add_argument("--area")
+        filtered_parser.add_argument(
+            "--min-grade", type=grade_correspondence, metavar="GRADE"
+        )
+        filtered_parser.add_argument(
+            "--max-grade", type=grade_correspondence, metavar="GRADE"
+        )
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="upgrade the database to the current schema"
+    )
+    migrate_parser.add_argument("db")
+    migrate_parser.add_argument(
+        "--rebuild-statistics",
+        action="store_true",
+        help="also recompute the pre-aggregated statistics",
+    )
+    migrate_parser.set_defaults(function=run_migrate)
+
+    vacuum_parser = subparsers.add_parser(
+        "vacuum", help="compact the database file"
+    )
+    vacuum_parser.add_argument("db")
+    vacuum_parser.set_defaults(function=run_vacuum)
+
+    return parser
+
+
+def main(argv=None):
+    arguments = get_parser().parse_args(argv)
+    if arguments.command == "import" and arguments.dry_run:
+        arguments.new_only = True
+    with timed("total"):
+        arguments.function(arguments)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
+import shutil
+from contextlib import contextmanager
 
-from kivy.utils import platform
+from sqlalchemy import create_engine, event
 
 from models.grade import Grade
 
@@ -26,8 +28,400 @@ GRADE_ASSOCIATION_DICT = {
     "9a": 19,
 }
 
+# SQLite settings applied to every new connection, per deployment profile.
+# - WAL journal: readers never block on the writer and commits only append
+# to the log, which is cheap on flash storage. synchronous=NORMAL is safe in
+# WAL mode (a power loss can only drop the last commits).
+# - cache_size is in KiB when negative, mmap_size in bytes.
+CONNECTION_PROFILES = {
+    # Phones: limited memory
+    "mobile": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -8000,
+        "mmap_size": 32 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    # Desktop app
+    "desktop": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    # Imports, exports and reports run outside of the app
+    "batch": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -256000,
+        "mmap_size": 1024 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+
+# Environment variable overriding the connection profile of the app
+CONNECTION_PROFILE_ENV = "ASTAT_DB_PROFILE"
+
+
+def get_connection_profile():
+    """Returns the name of the connection profile for this deployment"""
+    profile = os.environ.get(CONNECTION_PROFILE_ENV)
+    if profile:
+        return profile
+    # Imported here so that the database can be used without kivy
+    from kivy.utils import platform
+
+    if platform in ("android", "ios"):
+        return "mobile"
+    return "desktop"
+
+
+def create_db_engine(db_path, profile=None):
+    """
+    Create the engine of a SQLite database, with the pragmas of a connection
+    profile (see CONNECTION_PROFILES) applied to every new connection
+    """
+    if profile is None:
+        profile = get_connection_profile()
+    if profile not in CONNECTION_PROFILES:
+        raise ValueError(
+            f"Unknown connection profile '{profile}' (from the argument or "
+            f"{CONNECTION_PROFILE_ENV}), valid profiles: "
+            f"{', '.join(CONNECTION_PROFILES)}"
+        )
+    pragmas = CONNECTION_PROFILES[profile]
+
+    engine = create_engine(f"sqlite:///{db_path}", echo=False)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    return engine
+
+
+def checkpoint_db(engine):
+    """
+    Write the content of the WAL file back into the database file, so the
+    database file alone holds all the data (e.g. before copying it)
+    """
+    with engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def vacuum_db(engine):
+    """
+    Compact the database file: merge the segments of the full-text index,
+    rebuild the file without its free pages and refresh the statistics of
+    the query planner. Needs exclusive access to the database.
+    """
+    with engine.connect() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO ascent_fts (ascent_fts) VALUES ('optimize')"
+        )
+        connection.commit()
+        connection.exec_driver_sql("VACUUM")
+        connection.exec_driver_sql("PRAGMA optimize")
+    checkpoint_db(engine)
+
+
+def replace_db_file(engine, source_path, db_path):
+    """
+    Replace the database file by a copy of another database file and bring
+    it up to the current schema version.
+    All the connections of the engine are closed and the WAL files of the
+    previous database removed so they are not applied to the new one.
+    """
+    engine.dispose()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    shutil.copy(source_path, db_path)
+    migrate_db(engine)
+
+
+def migration_001_indexes(connection):
+    """Create the covering indexes of the 'ascent' and 'todoclimb' tables"""
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ascent_area_grade_date "
+        "ON ascent (area_id, grade_id, ascent_date)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ascent_date ON ascent (ascent_date)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_ascent_grade_date "
+        "ON ascent (grade_id, ascent_date)"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_todoclimb_todolist_sector_grade "
+        "ON todoclimb (todolist_id, sector_id, grade_id)"
+    )
+
+
+def migration_002_ascent_fts(connection):
+    """
+    Create the 'ascent_fts' FTS5 table indexing the name and note of the
+    ascents, and the triggers keeping it in sync with the 'ascent' table
+    """
+    connection.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ascent_fts USING fts5("
+        "name, note, content='ascent', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_fts_insert "
+        "AFTER INSERT ON ascent BEGIN "
+        "INSERT INTO ascent_fts (rowid, name, note) "
+        "VALUES (new.id, new.name, new.note); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_fts_delete "
+        "AFTER DELETE ON ascent BEGIN "
+        "INSERT INTO ascent_fts (ascent_fts, rowid, name, note) "
+        "VALUES ('delete', old.id, old.name, old.note); "
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_fts_update "
+        "AFTER UPDATE OF name, note ON ascent BEGIN "
+        "INSERT INTO ascent_fts (ascent_fts, rowid, name, note) "
+        "VALUES ('delete', old.id, old.name, old.note); "
+        "INSERT INTO ascent_fts (rowid, name, note) "
+        "VALUES (new.id, new.name, new.note); "
+        "END"
+    )
+    # Index the ascents already logged
+    connection.exec_driver_sql(
+        "INSERT INTO ascent_fts (ascent_fts) VALUES ('rebuild')"
+    )
+
+
+def migration_003_bulk_load(connection):
+    """
+    Create the 'bulk_load' flag table. While the flag is active (only inside
+    the transaction of a bulk import, see bulk_load()) the per-row triggers
+    of the ascent insertions are skipped.
+    """
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS bulk_load ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), "
+        "active BOOLEAN NOT NULL DEFAULT 0)"
+    )
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO bulk_load (id, active) VALUES (1, 0)"
+    )
+    connection.exec_driver_sql("DROP TRIGGER IF EXISTS ascent_fts_insert")
+    connection.exec_driver_sql(
+        "CREATE TRIGGER ascent_fts_insert "
+        "AFTER INSERT ON ascent "
+        "WHEN NOT EXISTS (SELECT 1 FROM bulk_load WHERE active) BEGIN "
+        "INSERT INTO ascent_fts (rowid, name, note) "
+        "VALUES (new.id, new.name, new.note); "
+        "END"
+    )
+
+
+# Year of an ascent as stored in the 'ascent_statistic' table
+ASCENT_YEAR_SQL = "CAST(strftime('%Y', {}.ascent_date) AS INTEGER)"
+# Conflict clause adding the counts to an existing 'ascent_statistic' cell
+ASCENT_STATISTIC_UPSERT_SQL = (
+    "ON CONFLICT (area_id, grade_id, year) DO UPDATE SET "
+    "ascent_count = ascent_count + excluded.ascent_count, "
+    "flash_count = flash_count + excluded.flash_count"
+)
+
+
+def migration_004_ascent_statistic(connection):
+    """
+    Create the 'ascent_statistic' table holding the ascent and flash counts
+    per (area, grade, year), the triggers keeping it up to date and fill it
+    from the ascents already logged
+    """
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS ascent_statistic ("
+        "area_id INTEGER NOT NULL, grade_id INTEGER NOT NULL, "
+        "year INTEGER NOT NULL, ascent_count INTEGER NOT NULL, "
+        "flash_count INTEGER NOT NULL, "
+        "PRIMARY KEY (area_id, grade_id, year))"
+    )
+
+    def add_ascent_sql(row):
+        return (
+            "INSERT INTO ascent_statistic "
+            "(area_id, grade_id, year, ascent_count, flash_count) "
+            f"VALUES ({row}.area_id, {row}.grade_id, "
+            f"{ASCENT_YEAR_SQL.format(row)}, 1, "
+            f"CASE WHEN {row}.flash THEN 1 ELSE 0 END) "
+            f"{ASCENT_STATISTIC_UPSERT_SQL}; "
+        )
+
+    def remove_ascent_sql(row):
+        cell = (
+            f"area_id = {row}.area_id AND grade_id = {row}.grade_id "
+            f"AND year = {ASCENT_YEAR_SQL.format(row)}"
+        )
+        return (
+            "UPDATE ascent_statistic SET "
+            "ascent_count = ascent_count - 1, "
+            f"flash_count = flash_count - "
+            f"CASE WHEN {row}.flash THEN 1 ELSE 0 END "
+            f"WHERE {cell}; "
+            f"DELETE FROM ascent_statistic WHERE {cell} "
+            "AND ascent_count <= 0; "
+        )
+
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_statistic_insert "
+        "AFTER INSERT ON ascent "
+        "WHEN NOT EXISTS (SELECT 1 FROM bulk_load WHERE active) BEGIN "
+        f"{add_ascent_sql('new')}"
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_statistic_delete "
+        "AFTER DELETE ON ascent BEGIN "
+        f"{remove_ascent_sql('old')}"
+        "END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS ascent_statistic_update "
+        "AFTER UPDATE OF area_id, grade_id, ascent_date, flash ON ascent "
+        "BEGIN "
+        f"{remove_ascent_sql('old')}"
+        f"{add_ascent_sql('new')}"
+        "END"
+    )
+    rebuild_ascent_statistic(connection)
+
+
+def rebuild_ascent_statistic(connection):
+    """Recompute the whole 'ascent_statistic' table from the ascents"""
+    connection.exec_driver_sql("DELETE FROM ascent_statistic")
+    add_ascent_statistic(connection)
+
+
+def add_ascent_statistic(connection, after_ascent_id=0):
+    """
+    Add to the 'ascent_statistic' table the counts of the ascents with an id
+    greater than after_ascent_id
+    """
+    connection.exec_driver_sql(
+        "INSERT INTO ascent_statistic "
+        "(area_id, grade_id, year, ascent_count, flash_count) "
+        f"SELECT area_id, grade_id, {ASCENT_YEAR_SQL.format('ascent')}, "
+        "count(*), sum(CASE WHEN flash THEN 1 ELSE 0 END) "
+        "FROM ascent WHERE id > ? GROUP BY 1, 2, 3 "
+        f"{ASCENT_STATISTIC_UPSERT_SQL}",
+        (after_ascent_id,),
+    )
+
+
+def migration_005_purge_orphans(connection):
+    """
+    Delete the rows left behind by the deletes of areas, sectors and to-do
+    lists made before they removed their children
+    """
+    purge_orphans(connection)
+
+
+def purge_orphans(connection):
+    """
+    Delete the ascents without area, and the sectors and to-do list climbs
+    without to-do list or with a deleted sector, using one statement per
+    kind of orphan
+    :return: the number of deleted rows
+    """
+    statements = [
+        "DELETE FROM ascent WHERE area_id NOT IN (SELECT id FROM area)",
+        "DELETE FROM sector "
+        "WHERE todolist_id NOT IN (SELECT id FROM todolist)",
+        "DELETE FROM todoclimb "
+        "WHERE todolist_id NOT IN (SELECT id FROM todolist) "
+        "OR (sector_id IS NOT NULL "
+        "AND sector_id NOT IN (SELECT id FROM sector))",
+    ]
+    return sum(
+        connection.exec_driver_sql(statement).rowcount
+        for statement in statements
+    )
+
+
+# Ordered list of the schema migrations. The position of a migration in the
+# list (starting at 1) is the schema version it upgrades the database to.
+# Migrations must never be reordered or removed once released.
+MIGRATIONS = [
+    migration_001_indexes,
+    migration_002_ascent_fts,
+    migration_003_bulk_load,
+    migration_004_ascent_statistic,
+    migration_005_purge_orphans,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection):
+    """Returns the schema version stored in the database header"""
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate_db(engine):
+    """
+    Upgrade the database schema in place to SCHEMA_VERSION.
+    The current version is read from 'PRAGMA user_version' and every pending
+    migration is applied in order, each one in its own transaction.
+    :return: the list of the applied schema versions
+    """
+    applied = []
+    with engine.connect() as connection:
+        current_version = get_schema_version(connection)
+
+    for version in range(current_version + 1, SCHEMA_VERSION + 1):
+        with engine.begin() as connection:
+            MIGRATIONS[version - 1](connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+        applied.append(version)
+
+    return applied
+
+
+@contextmanager
+def bulk_load(connection):
+    """
+    Context manager for inserting a large number of ascents on a connection.
+    The per-row insert triggers are suspended and the inserted ascents are
+    indexed and counted in the statistics in bulk at exit. Must be used
+    inside a transaction so the flag is never visible to other connections,
+    nor left active on failure.
+    """
+    last_ascent_id = connection.exec_driver_sql(
+        "SELECT coalesce(max(id), 0) FROM ascent"
+    ).scalar()
+    connection.exec_driver_sql("UPDATE bulk_load SET active = 1")
+
+    yield
+
+    connection.exec_driver_sql(
+        "INSERT INTO ascent_fts (rowid, name, note) "
+        "SELECT id, name, note FROM ascent WHERE id > ?",
+        (last_ascent_id,),
+    )
+    add_ascent_statistic(connection, last_ascent_id)
+    connection.exec_driver_sql("UPDATE bulk_load SET active = 0")
+
 
 def get_db_path():
+    from kivy.utils import platform
+
     db_filename = "astat.db"
     if platform == "win":
         data_dir = os.getcwd()
@@ -47,6 +441,20 @@ def get_db_path():
     return writable_db_path
 
 
+def get_sql_log_path():
+    """Returns the path of the log file of the SQL instrumentation"""
+    return os.path.join(
+        os.path.dirname(get_db_path()), "sql-diagnostics.log"
+    )
+
+
+def get_startup_trace_path():
+    """Returns the path of the file the startup traces are appended to"""
+    return os.path.join(
+        os.path.dirname(get_db_path()), "startup-trace.jsonl"
+    )
+
+
 def get_android_documents_path():
     """Returns the absolute path to the user's Documents directory on Android.
     """
@@ -60,6 +468,18 @@ def get_android_documents_path():
     return documents_dir
 
 
+def get_export_dir():
+    """
+    Returns the directory the exported files are written to: the downloads
+    folder on Android, the working directory otherwise
+    """
+    from kivy.utils import platform
+
+    if platform == "android":
+        return get_android_documents_path()
+    return os.getcwd()
+
+
 def get_grades_as_object():
     """
     Create and return a list of Grade Objects to initialize the 'grade' table
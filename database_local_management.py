@@ -1,168 +1,509 @@
+import argparse
 import csv
-from datetime import date
-from sqlalchemy import select, create_engine
-from sqlalchemy.orm import sessionmaker, scoped_session
+import gzip
+from datetime import date, datetime
+from itertools import islice
 
+from sqlalchemy import bindparam, func, insert, select, update
+
+from database import (
+    bulk_load,
+    create_db_engine,
+    get_grades_as_object,
+    migrate_db,
+    rebuild_ascent_statistic,
+)
 from models.base import Base
 from models.area import Area
 from models.grade import Grade
 from models.ascent import Ascent
+from search import normalize
 
-GRADE_ASSOCIATION_DICT = {
-    "6a": 1,
-    "6a+": 2,
-    "6b": 3,
-    "6b+": 4,
-    "6c": 5,
-    "6c+": 6,
-    "7a": 7,
-    "7a+": 8,
-    "7b": 9,
-    "7b+": 10,
-    "7c": 11,
-    "7c+": 12,
-    "8a": 13,
-    "8a+": 14,
-    "8b": 15,
-    "8b+": 16,
-    "8c": 17,
-    "8c+": 18,
-    "9a": 19,
-}
-
-db_path = "astat.db"
-
-DATABASE_URL = f"sqlite:///{db_path}"
-engine = create_engine(DATABASE_URL, echo=False)
-
-session_factory = sessionmaker(bind=engine)
-
-Session = scoped_session(session_factory)
-
-
-def load_ascents_to_csv():
-    with Session() as session:
-        ascents = session.execute(
-            select(
-                Ascent.name,
-                Grade.grade_value,
-                Ascent.ascent_date,
-                Area.name,
-            )
-            .join(Ascent.area)
-            .join(Ascent.grade)
-        ).all()
+# Number of ascents inserted per executemany
+IMPORT_CHUNK_SIZE = 5000
+# Number of ascents fetched at once from the database during an export
+EXPORT_CHUNK_SIZE = 1000
 
-    with open(
-        "./ascents_export.csv", "w", encoding="utf-8", newline=""
-    ) as export_file:
-        writer = csv.writer(
-            export_file,
-            delimiter=";",
+
+def open_export_file(path):
+    """
+    Open a .csv export file for writing. The file is gzip compressed when its
+    name ends with '.gz'
+    """
+    if path.endswith(".gz"):
+        return gzip.open(
+            path, "wt", compresslevel=6, encoding="utf-8", newline=""
         )
-        writer.writerows(ascents)
+    return open(path, "w", encoding="utf-8", newline="")
 
 
-def load_ascents_from_csv():
-    """Load ascents as a list of dictionaries"""
-    with open("./ascents_import.csv", "r", encoding="utf-8") as boulders_file:
-        ascents = csv.reader(boulders_file, delimiter=";")
-        ascents_data = []
-        for ascent in ascents:
-            ascents_data.append(
-                {
-                    "name": ascent[0],
-                    "grade": ascent[1],
-                    "date": ascent[2],
-                    "area": ascent[3],
-                }
-            )
-    return ascents_data
+def open_import_file(path):
+    """
+    Open a .csv file to import, decompressing it when its name ends with
+    '.gz'. A leading byte order mark is skipped.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
 
 
-def get_grades_as_object():
+def export_ascents(
+    connection,
+    export_file,
+    area=None,
+    min_grade_correspondence=None,
+    max_grade_correspondence=None,
+    start_date=None,
+    end_date=None,
+    chunk_size=EXPORT_CHUNK_SIZE,
+):
     """
-    Create and return a list of Grade Objects to initialize the 'grade' table
-    in the database
+    Write the ascents as .csv rows (name;grade;date;area;flash;note) to a
+    file-like object. Rows are streamed from the database by chunks so the
+    memory used does not depend on the number of ascents.
+
+    Parameters:
+    connection: Connection to the database.
+    export_file: Text file-like object the rows are written to.
+    area: Optional area name filter.
+    min_grade_correspondence, max_grade_correspondence: Optional grade range
+    filter.
+    start_date, end_date: Optional date range filter (inclusive).
+    chunk_size: Number of rows fetched at once.
+    :return: the number of ascents exported
     """
-    grades = []
-    for grade_value, correspondence in GRADE_ASSOCIATION_DICT.items():
-        grades.append(
-            Grade(grade_value=grade_value, correspondence=correspondence)
+    query = (
+        select(
+            Ascent.name,
+            Grade.grade_value,
+            # Formatted by SQLite, much faster than in Python per row
+            func.strftime("%d/%m/%Y", Ascent.ascent_date),
+            Area.name,
+            Ascent.flash,
+            Ascent.note,
         )
-    return grades
+        .join(Ascent.area)
+        .join(Ascent.grade)
+        .order_by(Ascent.ascent_date, Ascent.id)
+    )
+    if area is not None:
+        query = query.where(Area.name == area)
+    if min_grade_correspondence is not None:
+        query = query.where(Grade.correspondence >= min_grade_correspondence)
+    if max_grade_correspondence is not None:
+        query = query.where(Grade.correspondence <= max_grade_correspondence)
+    if start_date is not None:
+        query = query.where(Ascent.ascent_date >= start_date)
+    if end_date is not None:
+        query = query.where(Ascent.ascent_date <= end_date)
+
+    writer = csv.writer(export_file, delimiter=";")
+    result = connection.execution_options(yield_per=chunk_size).execute(
+        query
+    )
+    exported = 0
+    for rows in result.partitions():
+        writer.writerows(rows)
+        exported += len(rows)
+    return exported
 
 
-def get_areas_as_objects(ascents):
+def load_ascents_to_csv(engine, csv_path, **filters):
     """
-    Create and return a list of Area Objects to initialize the 'area' table
-    in the database. The list is based on the .csv given as input.
+    Export the ascents to a .csv file (gzip compressed if its name ends with
+    '.gz'). See export_ascents() for the filters.
+    :return: the number of ascents exported
     """
-    areas = []
-    for ascent in ascents:
-        if ascent["area"] not in areas:
-            areas.append(ascent["area"])
-    areas_objects = []
-    for area in areas:
-        areas_objects.append(Area(name=area))
-    return areas_objects
+    with engine.connect() as connection, open_export_file(
+        csv_path
+    ) as export_file:
+        return export_ascents(connection, export_file, **filters)
 
 
-def get_ascents_as_object(ascents, session):
+def read_ascents_from_csv(csv_path):
     """
-    Create and return a list of Area Objects to initialize the 'ascent' table
-    in the database. The list is based on the .csv given as input.
+    Stream the ascents of a .csv file (gzip compressed if its name ends with
+    '.gz') as dictionaries.
+    Expected columns : name;grade;date;area, optionally followed by flash
+    and note (as written by export_ascents()). The flash and note of a row
+    without these columns are None, so a re-import does not overwrite them.
     """
-    ascents_object_list = []
-    for ascent in ascents:
-        grade_id = session.scalar(
-            select(Grade.id).where(Grade.grade_value == ascent["grade"])
+    with open_import_file(csv_path) as csv_file:
+        for ascent in csv.reader(csv_file, delimiter=";"):
+            # Skip blank lines
+            if not ascent:
+                continue
+            yield {
+                "name": ascent[0],
+                "grade": ascent[1],
+                "date": ascent[2],
+                "area": ascent[3],
+                "flash": parse_flash(ascent[4]) if len(ascent) > 4 else None,
+                "note": ascent[5] if len(ascent) > 5 else None,
+            }
+
+
+def parse_ascent_date(value):
+    """Parse a date written as dd/mm/yyyy or as yyyy-mm-dd"""
+    if "/" in value:
+        day, month, year = value.split("/")
+        return date(int(year), int(month), int(day))
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_flash(value):
+    """Parse a flash column written as 1/0, true/false or yes/no"""
+    return value.strip().lower() in ("1", "true", "yes")
+
+
+def get_ascent_key(name, ascent_date, area, grade):
+    """
+    Content key identifying an ascent across imports: the name is compared
+    without case, accents and extra spaces
+    """
+    return (" ".join(normalize(name).split()), ascent_date, area, grade)
+
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most size elements"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def create_missing_areas(connection, area_names, area_ids):
+    """
+    Create in one batch the areas not in area_ids (name -> id)
+    :return: the updated area_ids dictionary
+    """
+    missing_areas = set(area_names) - area_ids.keys()
+    if not missing_areas:
+        return area_ids
+    connection.execute(
+        insert(Area),
+        [{"name": area} for area in sorted(missing_areas)],
+    )
+    return dict(connection.execute(select(Area.name, Area.id)).all())
+
+
+def get_grade_id(ascent, grade_ids):
+    """Resolve the grade of an ascent read from a .csv"""
+    grade_id = grade_ids.get(ascent["grade"])
+    if grade_id is None:
+        raise ValueError(
+            f"Unknown grade '{ascent['grade']}' for the ascent "
+            f"'{ascent['name']}'"
         )
-        area_id = session.scalar(
-            select(Area.id).where(Area.name == ascent["area"])
+    return grade_id
+
+
+def get_ascent_row(ascent, grade_ids, area_ids):
+    """Build the 'ascent' table row of an ascent read from a .csv"""
+    return {
+        "name": ascent["name"],
+        "grade_id": get_grade_id(ascent, grade_ids),
+        "area_id": area_ids[ascent["area"]],
+        "ascent_date": parse_ascent_date(ascent["date"]),
+        "flash": bool(ascent.get("flash")),
+        "note": ascent.get("note") or "",
+    }
+
+
+def import_ascents(
+    connection, ascents, chunk_size=IMPORT_CHUNK_SIZE, progress=None
+):
+    """
+    Insert ascents in the database.
+    Grades and areas are resolved through in-memory dictionaries, the missing
+    areas of each chunk are created in one batch and the ascents are inserted
+    with one executemany per chunk. Runs in the transaction of the given
+    connection.
+
+    Parameters:
+    connection: Connection to the database, inside a transaction.
+    ascents: Iterable of dictionaries (see read_ascents_from_csv()).
+    chunk_size: Number of ascents inserted at once.
+    progress: Optional function called with the number of ascents imported
+    after each chunk.
+    :return: the number of ascents imported
+    """
+    grade_ids = dict(
+        connection.execute(select(Grade.grade_value, Grade.id)).all()
+    )
+    area_ids = dict(connection.execute(select(Area.name, Area.id)).all())
+
+    imported = 0
+    for chunk in chunked(ascents, chunk_size):
+        area_ids = create_missing_areas(
+            connection, (ascent["area"] for ascent in chunk), area_ids
         )
+        rows = [
+            get_ascent_row(ascent, grade_ids, area_ids) for ascent in chunk
+        ]
+        connection.execute(insert(Ascent), rows)
+
+        imported += len(rows)
+        if progress:
+            progress(imported)
 
-        full_date = ascent["date"]
-        day, month, year = full_date.split("/")
+    return imported
 
-        ascents_object_list.append(
-            Ascent(
-                name=ascent["name"],
-                grade_id=grade_id,
-                area_id=area_id,
-                ascent_date=date(int(year), int(month), int(day)),
+
+class ImportSummary:
+    """Counts of an incremental import (see import_new_ascents())"""
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.areas_created = 0
+
+    def __repr__(self):
+        return (
+            f"<ImportSummary : read={self.read}, inserted={self.inserted}, "
+            f"updated={self.updated}, unchanged={self.unchanged}, "
+            f"duplicates={self.duplicates}, "
+            f"areas_created={self.areas_created}>"
+        )
+
+
+def import_new_ascents(
+    connection,
+    ascents,
+    update_changed=False,
+    dry_run=False,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    progress=None,
+):
+    """
+    Import only the ascents which are not in the database yet, so the same
+    file can be imported again.
+    An ascent is identified by its content key (see get_ascent_key()). The
+    keys of each chunk are loaded in a temporary table and joined with the
+    'ascent' table through its (area_id, grade_id, ascent_date) index, so
+    the cost depends on the size of the file, not of the database.
+
+    Parameters:
+    connection: Connection to the database, inside a transaction.
+    ascents: Iterable of dictionaries (see read_ascents_from_csv()).
+    update_changed: Update the flash and note of the ascents already in the
+    database when they differ. Only the columns present in the file (not
+    None) are compared and updated.
+    dry_run: Only compute the summary, nothing is written.
+    chunk_size: Number of ascents processed at once.
+    progress: Optional function called with the number of ascents read
+    after each chunk.
+    :return: an ImportSummary
+    """
+    summary = ImportSummary()
+    grade_ids = dict(
+        connection.execute(select(Grade.grade_value, Grade.id)).all()
+    )
+    area_ids = dict(connection.execute(select(Area.name, Area.id)).all())
+    new_areas = set()
+    seen_keys = set()
+
+    connection.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS import_key ("
+        "row_number INTEGER PRIMARY KEY, area_id INTEGER, "
+        "grade_id INTEGER, ascent_date TEXT)"
+    )
+    update_statement = (
+        update(Ascent)
+        .where(Ascent.id == bindparam("ascent_id"))
+        .values(
+            # A None parameter (column missing from the file) keeps the value
+            flash=func.coalesce(bindparam("new_flash"), Ascent.flash),
+            note=func.coalesce(bindparam("new_note"), Ascent.note),
+        )
+    )
+
+    for chunk in chunked(ascents, chunk_size):
+        summary.read += len(chunk)
+
+        # Drop the ascents present several times in the file
+        candidates = []
+        for ascent in chunk:
+            get_grade_id(ascent, grade_ids)
+            ascent_date = parse_ascent_date(ascent["date"])
+            key = get_ascent_key(
+                ascent["name"], ascent_date, ascent["area"], ascent["grade"]
+            )
+            if key in seen_keys:
+                summary.duplicates += 1
+                continue
+            seen_keys.add(key)
+            candidates.append((key, ascent))
+
+        # Match the candidates of known areas with the existing ascents
+        keys = [
+            (
+                row_number,
+                area_ids[ascent["area"]],
+                grade_ids[ascent["grade"]],
+                key[1].isoformat(),
+            )
+            for row_number, (key, ascent) in enumerate(candidates)
+            if ascent["area"] in area_ids
+        ]
+        existing = {}
+        if keys:
+            connection.exec_driver_sql(
+                "INSERT INTO import_key "
+                "(row_number, area_id, grade_id, ascent_date) "
+                "VALUES (?, ?, ?, ?)",
+                keys,
+            )
+            for row_number, ascent_id, name, flash, note in (
+                connection.exec_driver_sql(
+                    "SELECT k.row_number, a.id, a.name, a.flash, a.note "
+                    "FROM import_key k JOIN ascent a "
+                    "ON a.area_id = k.area_id AND a.grade_id = k.grade_id "
+                    "AND a.ascent_date = k.ascent_date"
+                )
+            ):
+                key = candidates[row_number][0]
+                if get_ascent_key(name, *key[1:]) == key:
+                    existing[row_number] = (ascent_id, bool(flash), note)
+            connection.exec_driver_sql("DELETE FROM import_key")
+
+        new_ascents = []
+        updates = []
+        for row_number, (key, ascent) in enumerate(candidates):
+            if row_number not in existing:
+                new_ascents.append(ascent)
+                continue
+            ascent_id, flash, note = existing[row_number]
+            changed = any(
+                ascent[column] is not None and ascent[column] != value
+                for column, value in (("flash", flash), ("note", note))
+            )
+            if update_changed and changed:
+                updates.append(
+                    {
+                        "ascent_id": ascent_id,
+                        "new_flash": ascent["flash"],
+                        "new_note": ascent["note"],
+                    }
+                )
+            else:
+                summary.unchanged += 1
+
+        summary.inserted += len(new_ascents)
+        summary.updated += len(updates)
+        new_areas.update(
+            ascent["area"]
+            for ascent in new_ascents
+            if ascent["area"] not in area_ids
+        )
+
+        if not dry_run:
+            area_ids = create_missing_areas(
+                connection,
+                (ascent["area"] for ascent in new_ascents),
+                area_ids,
             )
+            if new_ascents:
+                connection.execute(
+                    insert(Ascent),
+                    [
+                        get_ascent_row(ascent, grade_ids, area_ids)
+                        for ascent in new_ascents
+                    ],
+                )
+            if updates:
+                connection.execute(update_statement, updates)
+
+        if progress:
+            progress(summary.read)
+
+    summary.areas_created = len(new_areas)
+    return summary
+
+
+def load_ascents_to_db(engine, csv_path, progress=None):
+    """
+    Import the ascents of a .csv given as input in a single transaction
+    :return: the number of ascents imported
+    """
+    with engine.begin() as connection, bulk_load(connection):
+        return import_ascents(
+            connection, read_ascents_from_csv(csv_path), progress=progress
         )
-    return ascents_object_list
 
 
-def load_ascents_to_db():
-    """Initialize the database from a .csv given as input"""
-    ascents = load_ascents_from_csv()
-    areas = get_areas_as_objects(ascents)
+def load_new_ascents_to_db(
+    engine, csv_path, update_changed=False, dry_run=False, progress=None
+):
+    """
+    Import the ascents of a .csv given as input which are not in the
+    database yet, in a single transaction (see import_new_ascents())
+    :return: an ImportSummary
+    """
+    ascents = read_ascents_from_csv(csv_path)
+    if dry_run:
+        # Nothing is committed
+        with engine.connect() as connection:
+            return import_new_ascents(
+                connection,
+                ascents,
+                update_changed=update_changed,
+                dry_run=True,
+                progress=progress,
+            )
 
-    with Session() as session:
-        # Create all the tables
-        Base.metadata.create_all(engine)
-        # Initialize the 'area' and 'grade' tables
-        session.add_all(areas)
-        session.commit()
-        # Initialize the 'ascent' table based. Has to be done after the
-        # initialisation of 'area' and 'grade' for foreign key references
-        ascents = get_ascents_as_object(ascents, session)
-        session.add_all(ascents)
-        session.commit()
+    with engine.begin() as connection, bulk_load(connection):
+        return import_new_ascents(
+            connection,
+            ascents,
+            update_changed=update_changed,
+            progress=progress,
+        )
 
 
-def initialize_empty_db():
-    grades = get_grades_as_object()
-    with Session() as session:
-        Base.metadata.create_all(engine)
+def initialize_empty_db(engine):
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        connection.execute(
+            insert(Grade),
+            [
+                {
+                    "grade_value": grade.grade_value,
+                    "correspondence": grade.correspondence,
+                }
+                for grade in get_grades_as_object()
+            ],
+        )
+
 
-        session.add_all(grades)
-        session.commit()
+def rebuild_statistics(engine):
+    """Recompute the pre-aggregated statistics of an existing database"""
+    with engine.begin() as connection:
+        rebuild_ascent_statistic(connection)
 
 
 if __name__ == "__main__":
-    initialize_empty_db()
-    load_ascents_to_db()
+    parser = argparse.ArgumentParser(
+        description="Initialize astat.db from ./ascents_import.csv"
+    )
+    parser.add_argument(
+        "--rebuild-statistics",
+        action="store_true",
+        help="only recompute the statistics table of an existing astat.db",
+    )
+    arguments = parser.parse_args()
+
+    engine = create_db_engine("astat.db", profile="batch")
+    if arguments.rebuild_statistics:
+        migrate_db(engine)
+        rebuild_statistics(engine)
+    else:
+        initialize_empty_db(engine)
+        migrate_db(engine)
+        load_ascents_to_db(
+            engine,
+            "./ascents_import.csv",
+            progress=lambda count: print(f"{count} ascents imported"),
+        )
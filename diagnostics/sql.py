@@ -0,0 +1,211 @@
+"""
+Opt-in instrumentation of the SQL statements run by the app.
+
+Every statement executed on an instrumented engine is timed with the
+before/after_cursor_execute events of SQLAlchemy and attributed to the
+current action of its thread, e.g. 'StatisticScreen.on_pre_enter'. The
+actions are set with sql_instrumentation.action() and inherited by the
+work queued for the worker threads (see views.background.BackgroundQuery
+and models.writer.DatabaseWriter). The statements of a thread without
+action are attributed to the action of the main thread, the screen being
+displayed.
+
+Importing this module does not import kivy.
+"""
+
+import heapq
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+# Environment variable enabling the instrumentation at startup
+SQL_INSTRUMENTATION_ENV = "ASTAT_SQL_TRACE"
+# Durations kept per action for the percentiles
+MAX_DURATIONS = 10000
+# Slowest statements kept per action
+SLOWEST_COUNT = 5
+# Statements longer than this are truncated in the reports
+MAX_STATEMENT_LENGTH = 200
+
+
+class ActionStatistics:
+    """Count, timings and slowest statements of the SQL of one action"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.durations = deque(maxlen=MAX_DURATIONS)
+        # Heap of (duration, statement), the fastest first
+        self.slowest = []
+        # Number of executions of each statement, to spot N+1 patterns
+        self.statements = Counter()
+
+    def add(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        self.durations.append(duration)
+        self.statements[statement] += 1
+        if len(self.slowest) < SLOWEST_COUNT:
+            heapq.heappush(self.slowest, (duration, statement))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, statement))
+
+    def get_percentile(self, percent):
+        """:return: the duration below which percent % of them are"""
+        if not self.durations:
+            return 0.0
+        durations = sorted(self.durations)
+        index = max(0, round(percent / 100 * len(durations)) - 1)
+        return durations[index]
+
+    def get_slowest(self):
+        """:return: the slowest statements as (duration, statement)"""
+        return sorted(self.slowest, reverse=True)
+
+    def get_most_repeated(self):
+        """:return: the most executed statement as (statement, count)"""
+        return self.statements.most_common(1)[0]
+
+
+class SQLInstrumentation:
+    """
+    Aggregates the SQL statements per action once installed on an engine.
+    Only the events of the installed engines are listened to, so the
+    instrumentation costs nothing while disabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.actions = {}
+        self._engines = []
+        self._local = threading.local()
+        self._main_action = "startup"
+        self._main_thread = threading.main_thread()
+        self._lock = threading.Lock()
+
+    def install(self, engine):
+        """Instrument the statements of an engine"""
+        if engine in self._engines:
+            return
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+        self._engines.append(engine)
+        self.enabled = True
+
+    def uninstall(self):
+        """Stop instrumenting every engine, the results are kept"""
+        for engine in self._engines:
+            event.remove(engine, "before_cursor_execute", self._before_execute)
+            event.remove(engine, "after_cursor_execute", self._after_execute)
+        self._engines = []
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self.actions = {}
+
+    def get_action(self):
+        """:return: the action the statements of this thread belong to"""
+        action = getattr(self._local, "action", None)
+        if action is None:
+            return self._main_action
+        return action
+
+    def set_action(self, action):
+        """
+        Set the action of the current thread. On the main thread it is also
+        the default action of the other threads.
+        """
+        self._local.action = action
+        if threading.current_thread() is self._main_thread:
+            self._main_action = action
+
+    @contextmanager
+    def action(self, action):
+        """
+        Attribute the statements run in the block to an action, the
+        previous action is restored at exit
+        """
+        previous_action = getattr(self._local, "action", None)
+        previous_main_action = self._main_action
+        self.set_action(action)
+        try:
+            yield
+        finally:
+            self._local.action = previous_action
+            if threading.current_thread() is self._main_thread:
+                self._main_action = previous_main_action
+
+    def _before_execute(
+        self, connection, cursor, statement, parameters, context, executemany
+    ):
+        if context is not None:
+            context.astat_sql_start_time = time.perf_counter()
+
+    def _after_execute(
+        self, connection, cursor, statement, parameters, context, executemany
+    ):
+        # Statements started before the instrumentation was installed have
+        # no start time, they are not recorded
+        start_time = getattr(context, "astat_sql_start_time", None)
+        if start_time is None:
+            return
+        duration = time.perf_counter() - start_time
+        action = self.get_action()
+        with self._lock:
+            statistics = self.actions.get(action)
+            if statistics is None:
+                statistics = self.actions[action] = ActionStatistics()
+            statistics.add(" ".join(statement.split()), duration)
+
+    def get_report(self):
+        """
+        :return: a text report of the statements per action, the actions
+        with the most time spent first
+        """
+        with self._lock:
+            actions = sorted(
+                self.actions.items(),
+                key=lambda item: item[1].total_time,
+                reverse=True,
+            )
+            lines = []
+            for action, statistics in actions:
+                statement, repeated = statistics.get_most_repeated()
+                lines.append(
+                    f"{action}: {statistics.count} statements, "
+                    f"{statistics.total_time * 1000:.1f} ms, "
+                    f"p95 {statistics.get_percentile(95) * 1000:.2f} ms"
+                )
+                if repeated > 1:
+                    lines.append(
+                        f"  x{repeated}: {shorten(statement)}"
+                    )
+                for duration, statement in statistics.get_slowest():
+                    lines.append(
+                        f"  {duration * 1000:.2f} ms: {shorten(statement)}"
+                    )
+        if not lines:
+            return "No SQL statement recorded"
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Append the report, dated, to a log file"""
+        with open(path, "a", encoding="utf-8") as log_file:
+            log_file.write(
+                f"--- SQL statements {datetime.now().isoformat()} ---\n"
+            )
+            log_file.write(self.get_report() + "\n")
+
+
+def shorten(statement):
+    if len(statement) <= MAX_STATEMENT_LENGTH:
+        return statement
+    return statement[:MAX_STATEMENT_LENGTH] + "..."
+
+
+sql_instrumentation = SQLInstrumentation()
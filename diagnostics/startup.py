@@ -0,0 +1,71 @@
+"""
+Wall time of the phases of the startup of the app.
+
+The phases are recorded from main.py (imports), the app (init_db, .kv
+files, screens) and the screen manager (lazily built screens), up to the
+first frame. The trace is then appended as one JSON line to a file, so the
+startups of a device can be compared. The phases run after the trace is
+saved (warm-up, navigation) are not recorded.
+
+Importing this module does not import kivy.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class StartupTracer:
+    """Records (phase, start, duration) from the creation of the tracer"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []
+        self.first_frame = None
+        self.saved = False
+
+    def get_elapsed(self):
+        return time.perf_counter() - self.origin
+
+    @contextmanager
+    def phase(self, name):
+        """Record the wall time of the block as a phase, until saved"""
+        if self.saved:
+            yield
+            return
+        start = self.get_elapsed()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start, self.get_elapsed() - start))
+
+    def mark_first_frame(self):
+        """Record the time of the first frame, only the first call counts"""
+        if self.first_frame is None:
+            self.first_frame = self.get_elapsed()
+
+    def get_trace(self):
+        """:return: the trace as a dictionary of JSON compatible values"""
+        return {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "first_frame": self.first_frame,
+            "phases": [
+                {"name": name, "start": start, "duration": duration}
+                for name, start, duration in self.phases
+            ],
+        }
+
+    def save(self, path):
+        """
+        Append the trace as one JSON line to a file, the tracer then stops
+        recording
+        """
+        with open(path, "a", encoding="utf-8") as trace_file:
+            trace_file.write(json.dumps(self.get_trace()) + "\n")
+        self.saved = True
+        self.phases = []
+
+
+# Created when main.py is imported, before the other imports of the app
+startup_tracer = StartupTracer()
@@ -1,5 +1,9 @@
-from astat import AStatApp
-from kivy.config import Config
+# Imported first, its clock starts before the imports of the app
+from diagnostics.startup import startup_tracer
+
+with startup_tracer.phase("imports"):
+    from astat import AStatApp
+    from kivy.config import Config
 
 Config.set("kivy", "log_level", "debug")  # or debug
 
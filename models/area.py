@@ -1,9 +1,7 @@
 from typing import Optional, List
-from sqlalchemy import Integer, String, select
+from sqlalchemy import Integer, String, delete
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from kivymd.app import MDApp
-
 from models.base import Base
 import models.ascent
 
@@ -25,34 +23,32 @@ class Area(Base):
         return f"<Area : name={self.name}>"
 
     @classmethod
-    def create(cls, name):
-        with MDApp.get_running_app().get_db_session() as session:
+    def create(cls, name, callback=None, error_callback=None):
+        def create_area(session):
             area_created = Area(name=name)
             session.add(area_created)
-            session.commit()
+
+        return cls.submit_write(create_area, callback, error_callback)
 
     @classmethod
-    def delete(cls, id):
-        """Delete an Area and all associated ascents"""
-        with MDApp.get_running_app().get_db_session() as session:
-            area_to_delete = session.get(Area, id)
-            if area_to_delete:
-                # Manual delete of all associated ascents because not handled
-                # by SQLite
-                ascents_to_delete = session.scalars(
-                    select(models.ascent.Ascent).where(
-                        models.ascent.Ascent.area_id == area_to_delete.id
-                    )
-                ).all()
-
-                for ascent in ascents_to_delete:
-                    session.delete(ascent)
-
-                session.delete(area_to_delete)
-                session.commit()
-
-    def update(self, name):
-        with MDApp.get_running_app().get_db_session() as session:
-            updated_area = session.merge(self)
-            updated_area.name = name
-            session.commit()
+    def delete(cls, id, callback=None, error_callback=None):
+        """
+        Delete an Area and all associated ascents, with one DELETE statement
+        for the ascents and one for the area
+        """
+        Ascent = models.ascent.Ascent
+
+        def delete_area(session):
+            session.execute(
+                delete(Ascent)
+                .where(Ascent.area_id == id)
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(delete(Area).where(Area.id == id))
+
+        return cls.submit_write(delete_area, callback, error_callback)
+
+    def update(self, name, callback=None, error_callback=None):
+        return self.update_changed(
+            callback=callback, error_callback=error_callback, name=name
+        )
@@ -1,18 +1,51 @@
 from datetime import datetime, date
 
-from kivymd.app import MDApp
-
-from sqlalchemy import Boolean, ForeignKey, Integer, String, DateTime, Date
+from sqlalchemy import (
+    Boolean,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    DateTime,
+    Date,
+    column,
+    desc,
+    literal_column,
+    select,
+    table,
+    tuple_,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
-from models.base import Base
+from models.base import Base, get_session
 import models.area
 import models.grade
+from search import build_match_query
+
+# FTS5 table mirroring the name and note of the ascents. Created and kept in
+# sync by the database migrations, hence not part of the declarative models.
+ascent_fts = table(
+    "ascent_fts",
+    column("rowid"),
+    column("name"),
+    column("note"),
+    column("rank"),
+)
 
 
 class Ascent(Base):
     __tablename__ = "ascent"
+    __table_args__ = (
+        # Statistics filters (area, grade range) and date grouping
+        Index(
+            "ix_ascent_area_grade_date", "area_id", "grade_id", "ascent_date"
+        ),
+        # Ascent list ordered by date
+        Index("ix_ascent_date", "ascent_date"),
+        # Ascent list ordered by grade then date
+        Index("ix_ascent_grade_date", "grade_id", "ascent_date"),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True
@@ -46,15 +79,145 @@ class Ascent(Base):
         return f"<{self.name}>"
 
     @classmethod
-    def delete(cls, id):
-        with MDApp.get_running_app().get_db_session() as session:
+    def search_query(cls, text, in_note=False):
+        """
+        Build the full-text search query of the ascents matching a user
+        input, ranked by relevance. Every word of the input is matched as a
+        prefix, ignoring case and accents.
+        :return: a select of the matching ascent ids or None if the input
+        holds no searchable word
+        """
+        columns = ("note",) if in_note else ("name",)
+        match_query = build_match_query(text, columns)
+        if match_query is None:
+            return None
+        return (
+            select(ascent_fts.c.rowid)
+            .where(literal_column("ascent_fts").op("MATCH")(match_query))
+            .order_by(ascent_fts.c.rank)
+        )
+
+    @classmethod
+    def list_query(cls, area="All", search_text="", in_note=False):
+        """
+        Build the query of the ascent list. Only the displayed columns are
+        selected and the grade and the area are joined, so the whole list is
+        loaded with a single query.
+        :return: an unordered select of (id, name, grade_value, area_name,
+        ascent_date, flash, correspondence)
+        """
+        Grade = models.grade.Grade
+        Area = models.area.Area
+        query = (
+            select(
+                cls.id,
+                cls.name,
+                Grade.grade_value,
+                Area.name.label("area_name"),
+                cls.ascent_date,
+                cls.flash,
+                Grade.correspondence,
+            )
+            .join(Grade, Grade.id == cls.grade_id)
+            .join(Area, Area.id == cls.area_id)
+        )
+        # Area filter
+        if area != "All":
+            query = query.where(Area.name == area)
+
+        # Search filter, through the full-text index of the ascents
+        search_query = cls.search_query(search_text, in_note=in_note)
+        if search_query is not None:
+            query = query.where(cls.id.in_(search_query.order_by(None)))
+
+        return query
+
+    @classmethod
+    def list_page(cls, session, query, by_grade=False, after=None, limit=100):
+        """
+        Fetch one page of an ascent list query with keyset pagination, the
+        ascents being ordered by (ascent_date, id), or by (correspondence,
+        ascent_date, id) when sorted by grade, from the highest.
+        The grades are walked one after the other, so each page only reads
+        the index on (grade_id, ascent_date) instead of sorting every
+        matching ascent.
+
+        Parameters:
+        query: Query of the list (see list_query()), unordered.
+        after: Sort key (see list_sort_key()) of the last row of the previous
+        page, None for the first page.
+        :return: the rows of the page, fewer than limit when the list is
+        complete
+        """
+        if not by_grade:
+            if after is not None:
+                query = query.where(tuple_(cls.ascent_date, cls.id) < after)
+            return session.execute(
+                query.order_by(desc(cls.ascent_date), desc(cls.id)).limit(
+                    limit
+                )
+            ).all()
+
+        rows = []
+        for grade in reversed(models.grade.grade_registry.all()):
+            if after is not None and grade.correspondence > after[0]:
+                continue
+            grade_query = query.where(cls.grade_id == grade.id)
+            if after is not None and grade.correspondence == after[0]:
+                grade_query = grade_query.where(
+                    tuple_(cls.ascent_date, cls.id) < after[1:]
+                )
+            rows += session.execute(
+                grade_query.order_by(desc(cls.ascent_date), desc(cls.id))
+                .limit(limit - len(rows))
+            ).all()
+            if len(rows) == limit:
+                break
+        return rows
+
+    @staticmethod
+    def list_sort_key(row, by_grade=False):
+        """Sort key of a row of list_query(), see list_page()"""
+        if by_grade:
+            return row.correspondence, row.ascent_date, row.id
+        return row.ascent_date, row.id
+
+    @classmethod
+    def search(cls, text, in_note=False, limit=None):
+        """
+        Search the ascents by name (or by note)
+        :return: the list of the matching ascent ids, best match first
+        """
+        query = cls.search_query(text, in_note)
+        if query is None:
+            return []
+        if limit:
+            query = query.limit(limit)
+        with get_session() as session:
+            ascent_ids = session.scalars(query).all()
+        return ascent_ids
+
+    @classmethod
+    def delete(cls, id, callback=None, error_callback=None):
+        def delete_ascent(session):
             ascent_to_delete = session.get(cls, id)
             session.delete(ascent_to_delete)
-            session.commit()
+
+        return cls.submit_write(delete_ascent, callback, error_callback)
 
     @classmethod
-    def create(cls, name, grade_id, area_id, ascent_date, flash, note):
-        with MDApp.get_running_app().get_db_session() as session:
+    def create(
+        cls,
+        name,
+        grade_id,
+        area_id,
+        ascent_date,
+        flash,
+        note,
+        callback=None,
+        error_callback=None,
+    ):
+        def create_ascent(session):
             session.add(
                 Ascent(
                     name=name,
@@ -65,15 +228,29 @@ class Ascent(Base):
                     flash=flash,
                 )
             )
-            session.commit()
-
-    def update(self, name, grade_id, area_id, ascent_date, flash, note):
-        with MDApp.get_running_app().get_db_session() as session:
-            updated_ascent = session.merge(self)
-            updated_ascent.name = name
-            updated_ascent.grade_id = grade_id
-            updated_ascent.area_id = area_id
-            updated_ascent.ascent_date = ascent_date
-            updated_ascent.flash = flash
-            updated_ascent.note = note
-            session.commit()
+
+        return cls.submit_write(create_ascent, callback, error_callback)
+
+    def update(
+        self,
+        name,
+        grade_id,
+        area_id,
+        ascent_date,
+        flash,
+        note,
+        check_date_updated=False,
+        callback=None,
+        error_callback=None,
+    ):
+        return self.update_changed(
+            check_date_updated=check_date_updated,
+            callback=callback,
+            error_callback=error_callback,
+            name=name,
+            grade_id=grade_id,
+            area_id=area_id,
+            ascent_date=ascent_date,
+            flash=flash,
+            note=note,
+        )
@@ -0,0 +1,26 @@
+from sqlalchemy import Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.base import Base
+
+
+class AscentStatistic(Base):
+    """
+    Pre-aggregated ascent counts per (area, grade, year).
+    The rows are maintained by SQLite triggers on the 'ascent' table (see the
+    database migrations), they must never be written by the application.
+    """
+
+    __tablename__ = "ascent_statistic"
+
+    area_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    grade_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    year: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ascent_count: Mapped[int] = mapped_column(Integer, default=0)
+    flash_count: Mapped[int] = mapped_column(Integer, default=0)
+
+    def __repr__(self):
+        return (
+            f"<AscentStatistic : area={self.area_id}, grade={self.grade_id}, "
+            f"year={self.year}, ascents={self.ascent_count}>"
+        )
@@ -1,11 +1,243 @@
-from kivymd.app import MDApp
+from concurrent.futures import Future
 
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm.exc import StaleDataError
+
+from models.data_version import data_version
+
+# Maximum number of ids in the IN list of one bulk statement, below the
+# default limit of SQLite on the number of bound parameters
+BULK_CHUNK_SIZE = 500
+
+# Where the models get their sessions and the writer of their
+# modifications, set with configure_session() (by the app in init_db())
+_session_factory = None
+_writer = None
+
+
+def configure_session(session_factory, writer=None):
+    """
+    Set the function giving the sessions of the models and the
+    DatabaseWriter applying their modifications. Without a writer, the
+    modifications are committed synchronously.
+    """
+    global _session_factory, _writer
+    _session_factory = session_factory
+    _writer = writer
+
+
+def get_session():
+    """:return: a new session from the configured session factory"""
+    if _session_factory is None:
+        raise RuntimeError(
+            "No session factory, call models.base.configure_session() first"
+        )
+    return _session_factory()
+
+
+def _write_now(operation, callback=None, error_callback=None):
+    """Apply a modification in its own transaction, without a writer"""
+    future = Future()
+    try:
+        with get_session() as session:
+            result = operation(session)
+            session.commit()
+    except Exception as error:
+        future.set_exception(error)
+        if error_callback is not None:
+            error_callback(error)
+        return future
+    data_version.bump()
+    future.set_result(result)
+    if callback is not None:
+        callback(result)
+    return future
 
 
 class Base(DeclarativeBase):
     @classmethod
     def get_from_id(cls, id):
-        with MDApp.get_running_app().get_db_session() as session:
+        with get_session() as session:
             obj = session.get(cls, id)
         return obj
+
+    @staticmethod
+    def submit_write(operation, callback=None, error_callback=None):
+        """
+        Queue a modification of the database on the configured writer
+        thread (see models.writer.DatabaseWriter.submit()), or apply it
+        immediately if there is no writer
+        :return: a Future of the result of operation
+        """
+        if _writer is None:
+            return _write_now(operation, callback, error_callback)
+        return _writer.submit(operation, callback, error_callback)
+
+    @classmethod
+    def bulk_update(cls, ids, callback=None, error_callback=None, **values):
+        """
+        Set the same column values on several rows with a single UPDATE
+        statement (one per BULK_CHUNK_SIZE ids), in one transaction
+        :return: a Future of the number of updated rows
+        """
+        ids = list(ids)
+
+        def update_rows(session):
+            return sum(
+                session.execute(
+                    update(cls)
+                    .where(cls.id.in_(ids[start:start + BULK_CHUNK_SIZE]))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                for start in range(0, len(ids), BULK_CHUNK_SIZE)
+            )
+
+        return cls.submit_write(update_rows, callback, error_callback)
+
+    @classmethod
+    def bulk_delete(cls, ids, callback=None, error_callback=None):
+        """
+        Delete several rows with a single DELETE statement (one per
+        BULK_CHUNK_SIZE ids), in one transaction
+        :return: a Future of the number of deleted rows
+        """
+        ids = list(ids)
+
+        def delete_rows(session):
+            return sum(
+                session.execute(
+                    delete(cls)
+                    .where(cls.id.in_(ids[start:start + BULK_CHUNK_SIZE]))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                for start in range(0, len(ids), BULK_CHUNK_SIZE)
+            )
+
+        return cls.submit_write(delete_rows, callback, error_callback)
+
+    @classmethod
+    def update_by_id(
+        cls,
+        id,
+        expected_date_updated=None,
+        callback=None,
+        error_callback=None,
+        **values,
+    ):
+        """
+        Set some columns of one row with a single UPDATE statement, without
+        loading the row first.
+        When expected_date_updated is given, the row is only updated if its
+        date_updated still has this value (optimistic concurrency), otherwise
+        the Future raises a StaleDataError.
+        :return: a Future of the number of updated rows
+        """
+
+        def update_row(session):
+            updated, _ = cls._update_row(
+                session, id, expected_date_updated, values
+            )
+            return updated
+
+        return cls.submit_write(update_row, callback, error_callback)
+
+    @classmethod
+    def _update_row(cls, session, id, expected_date_updated, values):
+        """
+        Run the UPDATE statement of update_by_id()
+        :return: a tuple (number of updated rows, new date_updated of the row
+        or None for the models without this column)
+        """
+        statement = update(cls).where(cls.id == id)
+        if expected_date_updated is not None:
+            # Compared to the second, the precision of the stored dates
+            statement = statement.where(
+                func.datetime(cls.date_updated)
+                == func.datetime(expected_date_updated)
+            )
+        statement = statement.values(**values).execution_options(
+            synchronize_session=False
+        )
+
+        date_updated = None
+        if "date_updated" not in cls.__table__.c:
+            updated = session.execute(statement).rowcount
+        elif session.get_bind().dialect.update_returning:
+            # The value set by the onupdate default of the column
+            dates = session.scalars(
+                statement.returning(cls.date_updated)
+            ).all()
+            updated = len(dates)
+            if dates:
+                date_updated = dates[0]
+        else:
+            # UPDATE ... RETURNING needs SQLite 3.35, the older versions
+            # (e.g. of Android) read the date in the same transaction
+            updated = session.execute(statement).rowcount
+            if updated:
+                date_updated = session.scalar(
+                    select(cls.date_updated).where(cls.id == id)
+                )
+
+        if expected_date_updated is not None and updated == 0:
+            raise StaleDataError(
+                f"{cls.__name__} {id} was modified or deleted since it was "
+                "read"
+            )
+        return updated, date_updated
+
+    def update_changed(
+        self,
+        check_date_updated=False,
+        callback=None,
+        error_callback=None,
+        **values,
+    ):
+        """
+        Update only the columns whose value changed, with a single UPDATE
+        statement. The attributes of this object, and its date_updated, are
+        set once the modification is committed, before callback is called:
+        if it fails, the object still matches the row.
+        :param check_date_updated: Only update the row if it was not modified
+        since this object was read (for models with a date_updated column),
+        otherwise the Future raises a StaleDataError
+        :return: a Future of the number of updated rows
+        """
+        changed = {
+            key: value
+            for key, value in values.items()
+            if getattr(self, key) != value
+        }
+        if not changed:
+            future = Future()
+            future.set_result(0)
+            if callback is not None:
+                callback(0)
+            return future
+
+        expected_date_updated = (
+            self.date_updated if check_date_updated else None
+        )
+        # Values of the row once updated, set by the writer
+        new_values = {}
+
+        def update_row(session):
+            updated, date_updated = self._update_row(
+                session, self.id, expected_date_updated, changed
+            )
+            new_values.clear()
+            if updated:
+                new_values.update(changed)
+                if date_updated is not None:
+                    new_values["date_updated"] = date_updated
+            return updated
+
+        def on_updated(updated):
+            for key, value in new_values.items():
+                setattr(self, key, value)
+            if callback is not None:
+                callback(updated)
+
+        return self.submit_write(update_row, on_updated, error_callback)
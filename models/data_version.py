@@ -0,0 +1,64 @@
+import threading
+
+
+class DataVersion:
+    """
+    Version of the data of the database, used to invalidate the values
+    computed from it.
+
+    The version changes when the application bumps it after a modification
+    and when another connection, possibly from another process, commits a
+    change (detected with SQLite's 'PRAGMA data_version' on a connection
+    dedicated to this check).
+    """
+
+    def __init__(self):
+        self._local_version = 0
+        self._engine = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def bind(self, engine):
+        """Watch the database of an engine for external modifications"""
+        with self._lock:
+            self._close()
+            self._engine = engine
+            self._local_version += 1
+
+    def close(self):
+        """
+        Close the connection used to watch the database, which must be done
+        before the database file is replaced
+        """
+        with self._lock:
+            self._close()
+            self._engine = None
+
+    def bump(self):
+        """Mark the data as modified"""
+        with self._lock:
+            self._local_version += 1
+
+    def get(self):
+        """
+        Returns the current version. Two equal versions guarantee the data
+        did not change in between.
+        """
+        with self._lock:
+            external_version = None
+            if self._engine is not None:
+                if self._connection is None:
+                    self._connection = self._engine.raw_connection()
+                cursor = self._connection.cursor()
+                cursor.execute("PRAGMA data_version")
+                external_version = cursor.fetchone()[0]
+                cursor.close()
+            return self._local_version, external_version
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+data_version = DataVersion()
@@ -1,7 +1,7 @@
+import threading
+from collections import namedtuple
 from typing import List
 
-from kivymd.app import MDApp
-
 from sqlalchemy import Integer, SmallInteger, String, select
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -31,12 +31,58 @@ class Grade(Base):
     def __repr__(self):
         return f"<Grade : {self.grade_value}, {self.correspondence}>"
 
-    @classmethod
-    def get_grade_value_from_correspondence(cls, grade_correspondence):
-        with MDApp.get_running_app().get_db_session() as session:
-            grade = session.scalar(
-                select(Grade.grade_value).where(
-                    Grade.correspondence == grade_correspondence
-                )
-            )
-        return grade
+
+# Read-only copy of a grade row
+GradeEntry = namedtuple("GradeEntry", ["id", "grade_value", "correspondence"])
+
+
+class GradeRegistry:
+    """
+    In-memory copy of the grade table, loaded once at startup.
+    The grades never change while the app runs, so lookups by id, value or
+    correspondence are served from dictionaries without querying the
+    database. Reloading replaces all the lookup tables at once, they are
+    never modified in place.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._set_grades(())
+
+    def _set_grades(self, grades):
+        grades = tuple(sorted(grades, key=lambda grade: grade.correspondence))
+        self._tables = (
+            grades,
+            {grade.id: grade for grade in grades},
+            {grade.grade_value: grade for grade in grades},
+            {grade.correspondence: grade for grade in grades},
+        )
+
+    def load(self, engine):
+        """(Re)load the grades from the database of an engine"""
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(Grade.id, Grade.grade_value, Grade.correspondence)
+            ).all()
+        with self._lock:
+            self._set_grades(GradeEntry(*row) for row in rows)
+
+    def all(self):
+        """All the grades, ordered by increasing correspondence"""
+        return self._tables[0]
+
+    def get_by_id(self, grade_id):
+        return self._tables[1].get(grade_id)
+
+    def get_by_value(self, grade_value):
+        return self._tables[2].get(grade_value)
+
+    def get_by_correspondence(self, correspondence):
+        return self._tables[3].get(correspondence)
+
+    def get_grade_value_from_correspondence(self, correspondence):
+        grade = self.get_by_correspondence(correspondence)
+        return grade.grade_value if grade else None
+
+
+grade_registry = GradeRegistry()
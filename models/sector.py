@@ -1,9 +1,7 @@
 from typing import Optional, List
-from sqlalchemy import Integer, String, ForeignKey, select
+from sqlalchemy import Integer, String, ForeignKey, delete
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from kivymd.app import MDApp
-
 from models.base import Base
 import models.todoclimb
 import models.todolist
@@ -33,36 +31,33 @@ class Sector(Base):
         return f"<Area : name={self.name}>"
 
     @classmethod
-    def create(cls, name, todolist_id):
-        with MDApp.get_running_app().get_db_session() as session:
+    def create(cls, name, todolist_id, callback=None, error_callback=None):
+        def create_sector(session):
             sector_created = Sector(name=name, todolist_id=todolist_id)
             session.add(sector_created)
-            session.commit()
-            session.refresh(sector_created)
-
-    @classmethod
-    def delete(cls, id):
-        """Delete an Area and all associated ascents"""
-        with MDApp.get_running_app().get_db_session() as session:
-            sector_to_delete = session.get(Sector, id)
-            if sector_to_delete:
-                # Manual delete of all associated climbs because not handled
-                # by SQLite
-                ascents_to_delete = session.scalars(
-                    select(models.todoclimb.ToDoClimb).where(
-                        models.todoclimb.ToDoClimb.sector_id
-                        == sector_to_delete.id
-                    )
-                ).all()
+            return sector_created
 
-                for ascent in ascents_to_delete:
-                    session.delete(ascent)
+        return cls.submit_write(create_sector, callback, error_callback)
 
-                session.delete(sector_to_delete)
-                session.commit()
-
-    def update(self, name):
-        with MDApp.get_running_app().get_db_session() as session:
-            updated_sector = session.merge(self)
-            updated_sector.name = name
-            session.commit()
+    @classmethod
+    def delete(cls, id, callback=None, error_callback=None):
+        """
+        Delete a Sector and all associated climbs, with one DELETE statement
+        for the climbs and one for the sector
+        """
+        ToDoClimb = models.todoclimb.ToDoClimb
+
+        def delete_sector(session):
+            session.execute(
+                delete(ToDoClimb)
+                .where(ToDoClimb.sector_id == id)
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(delete(Sector).where(Sector.id == id))
+
+        return cls.submit_write(delete_sector, callback, error_callback)
+
+    def update(self, name, callback=None, error_callback=None):
+        return self.update_changed(
+            callback=callback, error_callback=error_callback, name=name
+        )
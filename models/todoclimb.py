@@ -1,9 +1,15 @@
 from datetime import datetime
 
-from kivymd.app import MDApp
-
 from typing import Optional
-from sqlalchemy import Boolean, ForeignKey, Integer, String, DateTime
+from sqlalchemy import (
+    Boolean,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    DateTime,
+    select,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -15,6 +21,14 @@ import models.todolist
 
 class ToDoClimb(Base):
     __tablename__ = "todoclimb"
+    __table_args__ = (
+        Index(
+            "ix_todoclimb_todolist_sector_grade",
+            "todolist_id",
+            "sector_id",
+            "grade_id",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True
@@ -56,17 +70,52 @@ class ToDoClimb(Base):
         return f"<{self.name}>"
 
     @classmethod
-    def delete(cls, id):
-        with MDApp.get_running_app().get_db_session() as session:
+    def list_query(cls, todolist_id):
+        """
+        Build the query of the climbs of a to-do list. Only the displayed
+        columns are selected and the grade and the sector are joined, so the
+        whole list is loaded with a single query.
+        :return: an unordered select of (id, name, grade_value, sector_name,
+        tag, star)
+        """
+        Grade = models.grade.Grade
+        Sector = models.sector.Sector
+        return (
+            select(
+                cls.id,
+                cls.name,
+                Grade.grade_value,
+                Sector.name.label("sector_name"),
+                cls.tag,
+                cls.star,
+            )
+            .join(Grade, Grade.id == cls.grade_id)
+            .outerjoin(Sector, Sector.id == cls.sector_id)
+            .where(cls.todolist_id == todolist_id)
+        )
+
+    @classmethod
+    def delete(cls, id, callback=None, error_callback=None):
+        def delete_climb(session):
             climb_to_delete = session.get(cls, id)
             session.delete(climb_to_delete)
-            session.commit()
+
+        return cls.submit_write(delete_climb, callback, error_callback)
 
     @classmethod
     def create(
-        cls, name, grade_id, todolist_id, note, star, sector_id=None, tag=None
+        cls,
+        name,
+        grade_id,
+        todolist_id,
+        note,
+        star,
+        sector_id=None,
+        tag=None,
+        callback=None,
+        error_callback=None,
     ):
-        with MDApp.get_running_app().get_db_session() as session:
+        def create_climb(session):
             session.add(
                 ToDoClimb(
                     name=name,
@@ -78,15 +127,29 @@ class ToDoClimb(Base):
                     star=star
                 )
             )
-            session.commit()
 
-    def update(self, name, grade_id, sector_id, note, tag, star):
-        with MDApp.get_running_app().get_db_session() as session:
-            updated_ascent = session.merge(self)
-            updated_ascent.name = name
-            updated_ascent.grade_id = grade_id
-            updated_ascent.sector_id = sector_id
-            updated_ascent.note = note
-            updated_ascent.tag = tag
-            updated_ascent.star = star
-            session.commit()
+        return cls.submit_write(create_climb, callback, error_callback)
+
+    def update(
+        self,
+        name,
+        grade_id,
+        sector_id,
+        note,
+        tag,
+        star,
+        check_date_updated=False,
+        callback=None,
+        error_callback=None,
+    ):
+        return self.update_changed(
+            check_date_updated=check_date_updated,
+            callback=callback,
+            error_callback=error_callback,
+            name=name,
+            grade_id=grade_id,
+            sector_id=sector_id,
+            note=note,
+            tag=tag,
+            star=star,
+        )
@@ -1,7 +1,5 @@
-from kivymd.app import MDApp
-
 from typing import List
-from sqlalchemy import Integer, String
+from sqlalchemy import Integer, String, delete
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from models.base import Base
@@ -30,25 +28,45 @@ class ToDoList(Base):
         return f"<{self.name}>"
 
     @classmethod
-    def delete(cls, id):
-        with MDApp.get_running_app().get_db_session() as session:
-            ascent_to_delete = session.get(cls, id)
-            session.delete(ascent_to_delete)
-            session.commit()
+    def delete(cls, id, callback=None, error_callback=None):
+        """
+        Delete a ToDoList with all its climbs and sectors, with one DELETE
+        statement for each table
+        """
+        ToDoClimb = models.todoclimb.ToDoClimb
+        Sector = models.sector.Sector
+
+        def delete_todolist(session):
+            session.execute(
+                delete(ToDoClimb)
+                .where(ToDoClimb.todolist_id == id)
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(
+                delete(Sector)
+                .where(Sector.todolist_id == id)
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(delete(ToDoList).where(ToDoList.id == id))
+
+        return cls.submit_write(delete_todolist, callback, error_callback)
 
     @classmethod
-    def create(cls, name):
-        with MDApp.get_running_app().get_db_session() as session:
+    def create(cls, name, callback=None, error_callback=None):
+        """
+        :return: a Future of the created to-do list, also given to the
+        optional callback once created
+        """
+
+        def create_todolist(session):
             todolist = ToDoList(name=name)
             session.add(todolist)
-            session.commit()
-            session.refresh(todolist)
-        return todolist
-
-    def update(self, name):
-        with MDApp.get_running_app().get_db_session() as session:
-            updated_todolist = session.merge(self)
-            updated_todolist.name = name
-            session.commit()
-            session.refresh(updated_todolist)
-            self.name = updated_todolist.name
+            session.flush()
+            return todolist
+
+        return cls.submit_write(create_todolist, callback, error_callback)
+
+    def update(self, name, callback=None, error_callback=None):
+        return self.update_changed(
+            callback=callback, error_callback=error_callback, name=name
+        )
@@ -0,0 +1,187 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+from diagnostics.sql import sql_instrumentation
+from models.data_version import data_version
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWriter:
+    """
+    Single background thread applying every modification of the database.
+
+    A modification is a function receiving the session of the writer, it is
+    submitted with submit() which returns a Future of its result. The
+    modifications submitted while a transaction is being written are grouped
+    in the next transaction, so a burst of modifications costs one commit
+    (one fsync) instead of one each. If a grouped transaction fails, its
+    modifications are written again one by one so that only the failing
+    one is lost.
+
+    Readers needing every submitted modification (read-your-writes) either
+    query from the callback of the modification or call flush() first,
+    which blocks until the modifications submitted before it are written
+    and returns at once when none is pending.
+    """
+
+    def __init__(self, session_factory, dispatch=None, max_batch_size=100):
+        """
+        Parameters:
+        session_factory: Function returning a new session, whose objects
+        are not expired on commit (results are used after the commit).
+        dispatch: Function used to run the callbacks of submit(), e.g. on
+        the thread of the UI. By default they run on the writer thread.
+        max_batch_size: Maximum number of modifications in one transaction.
+        """
+        self.session_factory = session_factory
+        self.dispatch = dispatch or (lambda function: function())
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        # Number of modifications submitted and written (or failed), the
+        # queue being written in order
+        self._submitted = 0
+        self._written = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="DatabaseWriter", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Write the pending modifications and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, operation, callback=None, error_callback=None):
+        """
+        Queue a modification of the database.
+
+        Parameters:
+        operation: Function receiving a session and applying the
+        modification, without committing it. Its return value is the result
+        of the Future.
+        callback: Optional function receiving the result once committed.
+        error_callback: Optional function receiving the exception if the
+        modification failed.
+        :return: a Future of the result of operation
+        """
+        if sql_instrumentation.enabled:
+            operation = self._in_action(
+                operation, sql_instrumentation.get_action()
+            )
+        future = Future()
+        if callback is not None or error_callback is not None:
+            future.add_done_callback(
+                lambda done: self._notify(done, callback, error_callback)
+            )
+        with self._condition:
+            self._submitted += 1
+            self._queue.put((operation, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Wait until the modifications submitted before the call are
+        committed (or failed), the later ones are not waited for.
+        :return: False if the timeout expired first
+        """
+        if threading.current_thread() is self._thread:
+            return True
+        with self._condition:
+            submitted = self._submitted
+            return self._condition.wait_for(
+                lambda: self._written >= submitted, timeout
+            )
+
+    @staticmethod
+    def _in_action(operation, action):
+        """
+        Attribute the SQL statements of operation to the action which
+        submitted it
+        """
+
+        def operation_in_action(session):
+            with sql_instrumentation.action(action):
+                return operation(session)
+
+        return operation_in_action
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            # Group the modifications already waiting in the same transaction
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            results = self._write_transaction(batch)
+        except Exception as error:
+            if len(batch) == 1:
+                logger.exception("DatabaseWriter: modification failed")
+                results = [(batch[0][1], None, error)]
+            else:
+                # Write the modifications one by one to isolate the failing
+                # one
+                results = []
+                for item in batch:
+                    results += self._write_isolated(item)
+
+        if any(error is None for _, _, error in results):
+            data_version.bump()
+
+        with self._condition:
+            self._written += len(batch)
+            self._condition.notify_all()
+
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _write_isolated(self, item):
+        try:
+            return self._write_transaction([item])
+        except Exception as error:
+            logger.exception("DatabaseWriter: modification failed")
+            return [(item[1], None, error)]
+
+    def _write_transaction(self, batch):
+        """Apply modifications in a single transaction"""
+        with self.session_factory() as session:
+            results = [
+                (future, operation(session), None)
+                for operation, future in batch
+            ]
+            session.commit()
+        return results
+
+    def _notify(self, future, callback, error_callback):
+        error = future.exception()
+        if error is None:
+            if callback is not None:
+                self.dispatch(lambda: callback(future.result()))
+        elif error_callback is not None:
+            self.dispatch(lambda: error_callback(error))
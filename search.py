@@ -0,0 +1,59 @@
+import re
+import unicodedata
+
+# Characters kept inside a token. Mirrors the FTS5 'unicode61' tokenizer used
+# by the 'ascent_fts' table: letters and digits, everything else separates
+# tokens.
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def normalize(text):
+    """
+    Normalize a text the way the FTS5 'unicode61 remove_diacritics 2'
+    tokenizer does: lower case and without diacritics
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(
+        character
+        for character in decomposed
+        if not unicodedata.combining(character)
+    )
+
+
+def tokenize(text):
+    """Split a text into normalized search tokens"""
+    return TOKEN_PATTERN.findall(normalize(text))
+
+
+def build_match_query(text, columns=("name",)):
+    """
+    Build an FTS5 MATCH expression from a user search input.
+    Every token is a prefix query and all of them must match, restricted to
+    the given columns.
+    :return: the MATCH expression or None if the input holds no token
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    phrases = " ".join(f'"{token}"*' for token in tokens)
+    return f"{{{' '.join(columns)}}} : ({phrases})"
+
+
+def matches(tokens, text):
+    """
+    Check if a text matches search tokens the way the FTS5 prefix query built
+    by build_match_query() does: every token is the prefix of a word of the
+    text
+    """
+    words = tokenize(text)
+    return all(
+        any(word.startswith(token) for word in words) for token in tokens
+    )
+
+
+def is_refinement(previous_text, text):
+    """
+    Check if a search input only narrows a previous one, in which case its
+    results are a subset of the previous results
+    """
+    return normalize(text).startswith(normalize(previous_text))
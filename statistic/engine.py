@@ -0,0 +1,309 @@
+"""
+Statistics of the logged ascents, independent of the Kivy application.
+
+Importing this module does not import kivy or kivymd: a StatisticsEngine
+only needs an SQLAlchemy engine or session factory, so batch processes,
+benchmarks and worker threads use the same computations as the app.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+
+from models.area import Area
+from models.ascent_statistic import AscentStatistic
+from models.data_version import DataVersion
+from models.grade import Grade, grade_registry
+from statistic.cache import StatisticsCache
+
+# Filters of a statistics computation, grades given by correspondence
+StatisticsFilter = namedtuple(
+    "StatisticsFilter",
+    ["min_grade_correspondence", "max_grade_correspondence", "area"],
+    defaults=[1, 19, "All"],
+)
+
+
+class Statistics:
+    """
+    Result of a statistics computation for one set of filters.
+
+    Holds the totals, the average grades and the per grade, per year and per
+    area breakdowns. The breakdowns are lists of tuples with format :
+    (value, number_of_ascent, number_of_flash)
+    """
+
+    def __init__(
+        self,
+        total_ascents=0,
+        total_flash=0,
+        average_grade=None,
+        average_flash_grade=None,
+        grade_data=None,
+        year_data=None,
+        area_data=None,
+    ):
+        self.total_ascents = total_ascents
+        self.total_flash = total_flash
+        self.average_grade = average_grade
+        self.average_flash_grade = average_flash_grade
+        self.grade_data = grade_data if grade_data is not None else []
+        self.year_data = year_data if year_data is not None else []
+        self.area_data = area_data if area_data is not None else []
+
+    def __repr__(self):
+        return (
+            f"<Statistics : total={self.total_ascents}, "
+            f"flash={self.total_flash}>"
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build the statistics from rows grouped by (grade, year, area).
+        Each row has format :
+        (grade_value, correspondence, year, area, ascents, flashes)
+        """
+        total_ascents = 0
+        total_flash = 0
+        grade_sum = 0
+        flash_grade_sum = 0
+        # grade_value -> [correspondence, ascents, flashes]
+        grades = {}
+        # year/area -> [ascents, flashes]
+        years = {}
+        areas = {}
+
+        for (
+            grade_value,
+            correspondence,
+            year,
+            area,
+            ascents,
+            flashes,
+        ) in rows:
+            flashes = flashes or 0
+            total_ascents += ascents
+            total_flash += flashes
+            grade_sum += correspondence * ascents
+            flash_grade_sum += correspondence * flashes
+
+            grade_entry = grades.setdefault(
+                grade_value, [correspondence, 0, 0]
+            )
+            grade_entry[1] += ascents
+            grade_entry[2] += flashes
+
+            year_entry = years.setdefault(year, [0, 0])
+            year_entry[0] += ascents
+            year_entry[1] += flashes
+
+            area_entry = areas.setdefault(area, [0, 0])
+            area_entry[0] += ascents
+            area_entry[1] += flashes
+
+        grade_data = [
+            (grade_value, ascents, flashes)
+            for grade_value, (_, ascents, flashes) in sorted(
+                grades.items(), key=lambda item: item[1][0], reverse=True
+            )
+        ]
+        year_data = [
+            (year, ascents, flashes)
+            for year, (ascents, flashes) in sorted(
+                years.items(), reverse=True
+            )
+        ]
+        area_data = [
+            (area, ascents, flashes)
+            for area, (ascents, flashes) in sorted(
+                sorted(areas.items()),
+                key=lambda item: item[1][0],
+                reverse=True,
+            )
+        ]
+
+        average_grade = None
+        average_flash_grade = None
+        if total_ascents:
+            average_grade = get_grade_value_from_average(
+                grade_sum / total_ascents
+            )
+        if total_flash:
+            average_flash_grade = get_grade_value_from_average(
+                flash_grade_sum / total_flash
+            )
+
+        return cls(
+            total_ascents=total_ascents,
+            total_flash=total_flash,
+            average_grade=average_grade,
+            average_flash_grade=average_flash_grade,
+            grade_data=grade_data,
+            year_data=year_data,
+            area_data=area_data,
+        )
+
+
+def get_grade_value_from_average(average_correspondence):
+    """Get the grade value closest to an average correspondence"""
+    if not average_correspondence:
+        return None
+    return grade_registry.get_grade_value_from_correspondence(
+        round(average_correspondence)
+    )
+
+
+class StatisticsEngine:
+    """
+    Computes the statistics of the ascents matching a filter.
+
+    Results are cached per filter until the data version changes, the
+    engines derived with with_filter() share the same cache.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        filter=None,
+        data_version=None,
+        cache=None,
+    ):
+        """
+        Parameters:
+        session_factory: Function returning a new session.
+        filter: StatisticsFilter of the computations, all ascents by
+        default.
+        data_version: DataVersion invalidating the cached results. Without
+        it, nothing is cached.
+        cache: StatisticsCache of the results, a new one by default.
+        """
+        self.session_factory = session_factory
+        self.filter = filter if filter is not None else StatisticsFilter()
+        self.data_version = data_version
+        self.cache = cache if cache is not None else StatisticsCache()
+
+    @classmethod
+    def from_engine(cls, engine, filter=None):
+        """
+        Create a statistics engine reading the database of an SQLAlchemy
+        engine, whose cache is invalidated by the commits on that database
+        """
+        data_version = DataVersion()
+        data_version.bind(engine)
+        return cls(
+            sessionmaker(bind=engine),
+            filter=filter,
+            data_version=data_version,
+        )
+
+    def with_filter(self, **filters):
+        """
+        :return: a statistics engine sharing the same database and cache,
+        with some of the filters changed
+        """
+        return StatisticsEngine(
+            self.session_factory,
+            filter=self.filter._replace(**filters),
+            data_version=self.data_version,
+            cache=self.cache,
+        )
+
+    def get_statistics(self, session=None):
+        """
+        Get every statistic for the filter of the engine, from the cache if
+        the data did not change since it was computed.
+        :param session: Session to query, a new one by default
+        :return: a Statistics object
+        """
+        if self.data_version is None:
+            return self.compute_statistics(session)
+
+        version = self.data_version.get()
+        statistics = self.cache.get(self.filter, version)
+        if statistics is None:
+            statistics = self.compute_statistics(session)
+            self.cache.put(self.filter, version, statistics)
+        return statistics
+
+    def compute_statistics(self, session=None):
+        """
+        Compute every statistic with a single query.
+        The query reads the pre-aggregated counts per (area, grade, year) of
+        the 'ascent_statistic' table, so its cost depends on the number of
+        cells, not on the number of ascents. The totals, averages and
+        breakdowns are derived from those cells.
+        :param session: Session to query, a new one by default
+        :return: a Statistics object
+        """
+        if session is None:
+            with self.session_factory() as session:
+                return self.compute_statistics(session)
+
+        # The averages are converted back to grades with the registry
+        if not grade_registry.all():
+            grade_registry.load(session.get_bind())
+
+        query = (
+            session.query(
+                Grade.grade_value,
+                Grade.correspondence,
+                AscentStatistic.year,
+                Area.name,
+                func.sum(AscentStatistic.ascent_count),
+                func.sum(AscentStatistic.flash_count),
+            )
+            .join(Grade, Grade.id == AscentStatistic.grade_id)
+            .join(Area, Area.id == AscentStatistic.area_id)
+            .filter(
+                Grade.correspondence >= self.filter.min_grade_correspondence,
+                Grade.correspondence <= self.filter.max_grade_correspondence,
+            )
+        )
+
+        if self.filter.area != "All":
+            query = query.filter(Area.name == self.filter.area)
+
+        rows = query.group_by(
+            Grade.id, AscentStatistic.year, Area.name
+        ).all()
+
+        return Statistics.from_rows(rows)
+
+    def get_total_ascent(self):
+        """
+        Get the total number of logged ascents
+        :return: a tuple with format : (number_of_ascent, number_of_flash)
+        """
+        statistics = self.get_statistics()
+        return statistics.total_ascents, statistics.total_flash
+
+    def get_area_data(self):
+        """
+        Get the number of ascent per area
+        :return: a list of tuple with format : (area, number_of_ascent, flash)
+        """
+        return self.get_statistics().area_data
+
+    def get_grade_data(self):
+        """
+        Get the number of ascent per grade
+        :return: a list of tuple with format : (grade, number_of_ascent, flash)
+        """
+        return self.get_statistics().grade_data
+
+    def get_year_data(self):
+        """
+        Get the number of ascent per year
+        :return: a list of tuple with format : (year, number_of_ascent, flash)
+        """
+        return self.get_statistics().year_data
+
+    def get_average_grade(self):
+        """
+        Get the average grade of the ascents and of the flashes
+        :return: a tuple with format : (average_grade, average_flash_grade)
+        """
+        statistics = self.get_statistics()
+        return statistics.average_grade, statistics.average_flash_grade
@@ -1,10 +1,38 @@
-from sqlalchemy import func, extract, desc, select, case
+from models.base import get_session
+from models.data_version import data_version
+from statistic.engine import StatisticsEngine
 
-from kivymd.app import MDApp
+# Statistics engine of the app, reading the database of the models. Its
+# cache is shared by all the filters and invalidated by the data version of
+# the app.
+statistics_engine = StatisticsEngine(get_session, data_version=data_version)
 
-from models.area import Area
-from models.ascent import Ascent
-from models.grade import Grade
+
+def get_statistics_engine(
+    min_grade_correspondence=1, max_grade_correpondence=19, area="All"
+):
+    """:return: the statistics engine of the app for these filters"""
+    return statistics_engine.with_filter(
+        min_grade_correspondence=min_grade_correspondence,
+        max_grade_correspondence=max_grade_correpondence,
+        area=area,
+    )
+
+
+def get_statistics(
+    min_grade_correspondence=1,
+    max_grade_correpondence=19,
+    area="All",
+    session=None,
+):
+    """
+    Get every statistic of the statistic screen. The result is cached for
+    these filters until the data of the database changes.
+    :return: a Statistics object
+    """
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_statistics(session)
 
 
 def get_total_ascent(
@@ -12,28 +40,11 @@ def get_total_ascent(
 ):
     """
     Get the total number of logged ascents
-    :return: the total number as an int
+    :return: a tuple with format : (number_of_ascent, number_of_flash)
     """
-    with MDApp.get_running_app().get_db_session() as session:
-        query = (
-            session.query(
-                func.count(Ascent.id),
-                func.sum(case((Ascent.flash == True, 1), else_=0)),
-            )
-            .join(Grade, Grade.id == Ascent.grade_id)
-            .join(Area, Area.id == Ascent.area_id)
-            .filter(
-                Grade.correspondence >= min_grade_correspondence,
-                Grade.correspondence <= max_grade_correpondence,
-            )
-        )
-
-        if area != "All":
-            query = query.filter(Area.name == area)
-
-        result = query.first()
-
-    return result
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_total_ascent()
 
 
 def get_area_data(
@@ -41,32 +52,11 @@ def get_area_data(
 ):
     """
     Get the number of ascent per area
-    :return: a list of tuple with format : (number_of_ascent, area)
+    :return: a list of tuple with format : (area, number_of_ascent, flash)
     """
-    with MDApp.get_running_app().get_db_session() as session:
-        query = (
-            session.query(
-                Area.name,
-                func.count(Ascent.id),
-                func.sum(case((Ascent.flash == True, 1), else_=0)),
-            )
-            .join(Ascent, Area.id == Ascent.area_id)
-            .join(Grade, Grade.id == Ascent.grade_id)
-            .filter(
-                Grade.correspondence >= min_grade_correspondence,
-                Grade.correspondence <= max_grade_correpondence,
-            )
-        )
-
-        if area != "All":
-            query = query.filter(Area.name == area)
-
-        result = (
-            query.group_by(Area.name)
-            .order_by(func.count(Ascent.id).desc())
-            .all()
-        )
-    return result
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_area_data()
 
 
 def get_grade_data(
@@ -74,32 +64,11 @@ def get_grade_data(
 ):
     """
     Get the number of ascent per grade
-    :return: a list of tuple with format : (number_of_ascent, grade)
+    :return: a list of tuple with format : (grade, number_of_ascent, flash)
     """
-    with MDApp.get_running_app().get_db_session() as session:
-        query = (
-            session.query(
-                Grade.grade_value,
-                func.count(Ascent.id),
-                func.sum(case((Ascent.flash == True, 1), else_=0)),
-            )
-            .join(Ascent, Grade.id == Ascent.grade_id)
-            .join(Area, Area.id == Ascent.area_id)
-            .filter(
-                Grade.correspondence >= min_grade_correspondence,
-                Grade.correspondence <= max_grade_correpondence,
-            )
-        )
-
-        if area != "All":
-            query = query.filter(Area.name == area)
-
-        result = (
-            query.group_by(Grade.grade_value)
-            .order_by(desc(Grade.correspondence))
-            .all()
-        )
-    return result
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_grade_data()
 
 
 def get_year_data(
@@ -107,72 +76,16 @@ def get_year_data(
 ):
     """
     Get the number of ascent per year
-    :return: a list of tuple with format : (number_of_ascent, year)
+    :return: a list of tuple with format : (year, number_of_ascent, flash)
     """
-    with MDApp.get_running_app().get_db_session() as session:
-        query = (
-            session.query(
-                extract("year", Ascent.ascent_date).label("year"),
-                func.count(Ascent.id),
-                func.sum(case((Ascent.flash == True, 1), else_=0)),
-            )
-            .join(Grade, Grade.id == Ascent.grade_id)
-            .join(Area, Area.id == Ascent.area_id)
-            .filter(
-                Grade.correspondence >= min_grade_correspondence,
-                Grade.correspondence <= max_grade_correpondence,
-            )
-        )
-
-        if area != "All":
-            query = query.filter(Area.name == area)
-
-        result = query.group_by("year").order_by(desc("year")).all()
-    return result
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_year_data()
 
 
 def get_average_grade(
     min_grade_correspondence=1, max_grade_correpondence=19, area="All"
 ):
-    with MDApp.get_running_app().get_db_session() as session:
-        query = (
-            session.query(
-                func.avg(Grade.correspondence),
-                func.avg(
-                    case(
-                        (Ascent.flash == True, Grade.correspondence),
-                        else_=None,
-                    )
-                ),
-            )
-            .join(Ascent, Grade.id == Ascent.grade_id)
-            .join(Area, Area.id == Ascent.area_id)
-            .filter(
-                Grade.correspondence >= min_grade_correspondence,
-                Grade.correspondence <= max_grade_correpondence,
-            )
-        )
-
-        if area != "All":
-            query = query.filter(Area.name == area)
-
-        average_grade, average_flash_grade = query.first()
-
-        # If the average grade returned by the query is not (No ascent with
-        # those filters), return None
-        average_grade = get_avg_grade_from_corresp(average_grade, session)
-        average_flash_grade = get_avg_grade_from_corresp(
-            average_flash_grade, session
-        )
-
-    return average_grade, average_flash_grade
-
-
-def get_avg_grade_from_corresp(average_correspondence, session):
-    if not average_correspondence:
-        return None
-    average_grade = round(average_correspondence)
-    average_grade = session.scalar(
-        select(Grade.grade_value).where(Grade.correspondence == average_grade)
-    )
-    return average_grade
+    return get_statistics_engine(
+        min_grade_correspondence, max_grade_correpondence, area
+    ).get_average_grade()
@@ -0,0 +1,99 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine, migrate_db
+from database_local_management import initialize_empty_db
+from models.area import Area
+from models.ascent import Ascent
+from models.base import configure_session, get_session
+from models.grade import grade_registry
+
+# Sample .csv of ascents shipped with the app
+SAMPLE_CSV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "ascents_import.csv",
+)
+
+
+@pytest.fixture
+def sample_csv():
+    return SAMPLE_CSV_PATH
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    Engine of a new database at the current schema version. The models use
+    it without writer thread, their modifications are committed before they
+    return.
+    """
+    engine = create_db_engine(str(tmp_path / "astat.db"), profile="desktop")
+    initialize_empty_db(engine)
+    migrate_db(engine)
+    grade_registry.load(engine)
+    configure_session(sessionmaker(bind=engine, expire_on_commit=False))
+    yield engine
+    configure_session(None)
+    engine.dispose()
+
+
+@pytest.fixture
+def area_ids(engine):
+    """Ids of the areas 'Fontainebleau' and 'Annot', by name"""
+    for name in ("Fontainebleau", "Annot"):
+        Area.create(name).result()
+    with engine.connect() as connection:
+        return dict(connection.execute(select(Area.name, Area.id)).all())
+
+
+@pytest.fixture
+def create_ascent(engine):
+    """Function logging an ascent with the model and returning its id"""
+
+    def create(
+        name,
+        area_id,
+        grade_id=1,
+        ascent_date=date(2024, 5, 1),
+        flash=False,
+        note="",
+    ):
+        Ascent.create(
+            name=name,
+            grade_id=grade_id,
+            area_id=area_id,
+            ascent_date=ascent_date,
+            flash=flash,
+            note=note,
+        ).result()
+        with get_session() as session:
+            return session.scalar(select(func.max(Ascent.id)))
+
+    return create
+
+
+@pytest.fixture
+def count_statements(engine):
+    """
+    Function calling the given function and returning the number of SQL
+    statements it executed
+    """
+
+    def count(function):
+        statements = []
+
+        def on_execute(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", on_execute)
+        try:
+            function()
+        finally:
+            event.remove(engine, "before_cursor_execute", on_execute)
+        return len(statements)
+
+    return count
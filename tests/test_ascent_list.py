@@ -0,0 +1,115 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import desc, insert
+
+from models.ascent import Ascent
+from models.base import get_session
+from models.grade import Grade, grade_registry
+
+PAGE_SIZE = 7
+
+
+@pytest.fixture
+def ascents(engine, area_ids):
+    """
+    Ascents on few dates and grades, so many of them share their sort
+    values and only the id breaks the ties
+    """
+    generator = random.Random(0)
+    names = ["Bloc", "Dalle", "Toit", "Traverse", "Fissure"]
+    rows = [
+        {
+            "name": f"{generator.choice(names)} {index}",
+            "grade_id": generator.randint(1, 6),
+            "area_id": generator.choice(list(area_ids.values())),
+            "ascent_date": date(2024, 1, 1)
+            + timedelta(days=generator.randint(0, 9)),
+            "flash": False,
+            "note": "",
+        }
+        for index in range(150)
+    ]
+    with engine.begin() as connection:
+        connection.execute(insert(Ascent), rows)
+
+
+def get_all_rows(query, by_grade):
+    """:return: the rows of the unpaginated query, in list order"""
+    order = [desc(Ascent.ascent_date), desc(Ascent.id)]
+    if by_grade:
+        order.insert(0, desc(Grade.correspondence))
+    with get_session() as session:
+        return session.execute(query.order_by(*order)).all()
+
+
+def get_paged_rows(query, by_grade):
+    """:return: the rows of every page of the query, page after page"""
+    rows = []
+    after = None
+    with get_session() as session:
+        while True:
+            page = Ascent.list_page(
+                session,
+                query,
+                by_grade=by_grade,
+                after=after,
+                limit=PAGE_SIZE,
+            )
+            assert len(page) <= PAGE_SIZE
+            rows += page
+            if len(page) < PAGE_SIZE:
+                return rows
+            after = Ascent.list_sort_key(page[-1], by_grade)
+
+
+@pytest.mark.parametrize("by_grade", [False, True], ids=["date", "grade"])
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"area": "Annot"},
+        {"search_text": "bloc"},
+        {"area": "Fontainebleau", "search_text": "dal"},
+    ],
+    ids=["all", "area", "search", "area_search"],
+)
+def test_pages_match_the_unpaginated_list(ascents, by_grade, filters):
+    query = Ascent.list_query(**filters)
+
+    expected = get_all_rows(query, by_grade)
+    paged = get_paged_rows(query, by_grade)
+
+    assert expected
+    assert paged == expected
+
+
+def test_empty_list(engine):
+    assert get_paged_rows(Ascent.list_query(), by_grade=True) == []
+
+
+def read_page(by_grade, limit):
+    """Load the first page of the list and read its displayed columns"""
+    with get_session() as session:
+        page = Ascent.list_page(
+            session, Ascent.list_query(), by_grade=by_grade, limit=limit
+        )
+        for row in page:
+            assert row.grade_value and row.area_name
+    assert len(page) == limit
+
+
+@pytest.mark.parametrize("limit", [5, 100])
+def test_page_by_date_is_one_statement(ascents, count_statements, limit):
+    assert count_statements(lambda: read_page(False, limit)) == 1
+
+
+def test_page_by_grade_statements_do_not_grow_with_page_size(
+    ascents, count_statements
+):
+    # At most one statement per grade walked, whatever the number of rows
+    small = count_statements(lambda: read_page(True, 5))
+    large = count_statements(lambda: read_page(True, 100))
+
+    assert small <= large <= len(grade_registry.all())
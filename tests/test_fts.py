@@ -0,0 +1,98 @@
+from datetime import date
+
+from sqlalchemy import func, select
+
+from database_local_management import load_ascents_to_db
+from models.area import Area
+from models.ascent import Ascent
+
+
+def check_integrity(engine):
+    """
+    Fail if the full-text index differs from the 'ascent' table or if the
+    database is corrupted
+    """
+    with engine.connect() as connection:
+        # Raises when the index does not match its content table
+        connection.exec_driver_sql(
+            "INSERT INTO ascent_fts (ascent_fts, rank) "
+            "VALUES ('integrity-check', 1)"
+        )
+        assert (
+            connection.exec_driver_sql("PRAGMA integrity_check").scalar()
+            == "ok"
+        )
+
+
+def test_insert_is_indexed(engine, area_ids, create_ascent):
+    ascent_id = create_ascent(
+        "Rainbow Rocket", area_ids["Fontainebleau"], note="Heel hook crux"
+    )
+
+    assert Ascent.search("rainbow") == [ascent_id]
+    assert Ascent.search("heel", in_note=True) == [ascent_id]
+    check_integrity(engine)
+
+
+def test_update_is_indexed(engine, area_ids, create_ascent):
+    ascent_id = create_ascent("Rainbow Rocket", area_ids["Fontainebleau"])
+    ascent = Ascent.get_from_id(ascent_id)
+
+    ascent.update(
+        name="Big Boss",
+        grade_id=ascent.grade_id,
+        area_id=ascent.area_id,
+        ascent_date=ascent.ascent_date,
+        flash=ascent.flash,
+        note="Crimps",
+    ).result()
+
+    assert Ascent.search("rainbow") == []
+    assert Ascent.search("boss") == [ascent_id]
+    assert Ascent.search("crimps", in_note=True) == [ascent_id]
+    check_integrity(engine)
+
+
+def test_delete_is_unindexed(engine, area_ids, create_ascent):
+    kept_id = create_ascent("Rainbow Rocket", area_ids["Fontainebleau"])
+    deleted_id = create_ascent("Rainbow Warrior", area_ids["Annot"])
+    bulk_deleted_id = create_ascent("Rainbow Road", area_ids["Annot"])
+
+    Ascent.delete(deleted_id).result()
+    Ascent.bulk_delete([bulk_deleted_id]).result()
+
+    assert Ascent.search("rainbow") == [kept_id]
+    check_integrity(engine)
+
+
+def test_area_delete_is_unindexed(engine, area_ids, create_ascent):
+    kept_id = create_ascent("Rainbow Rocket", area_ids["Fontainebleau"])
+    create_ascent("Rainbow Warrior", area_ids["Annot"])
+
+    Area.delete(area_ids["Annot"]).result()
+
+    assert Ascent.search("rainbow") == [kept_id]
+    check_integrity(engine)
+
+
+def test_bulk_load_import_is_indexed(
+    engine, area_ids, create_ascent, sample_csv
+):
+    existing_id = create_ascent(
+        "Renversement", area_ids["Fontainebleau"], ascent_date=date(2010, 1, 1)
+    )
+
+    imported = load_ascents_to_db(engine, sample_csv)
+
+    with engine.connect() as connection:
+        assert connection.scalar(select(func.count(Ascent.id))) == (
+            imported + 1
+        )
+        # Every imported ascent is found by its own name
+        rows = connection.execute(
+            select(Ascent.id, Ascent.name).where(Ascent.id != existing_id)
+        ).all()
+    for ascent_id, name in rows[::25]:
+        assert ascent_id in Ascent.search(name)
+    assert existing_id in Ascent.search("renversement")
+    check_integrity(engine)
@@ -0,0 +1,97 @@
+from sqlalchemy import func, select
+
+from database_local_management import load_new_ascents_to_db
+from models.area import Area
+from models.ascent import Ascent
+
+
+def count_rows(engine):
+    """:return: the number of ascents and of areas"""
+    with engine.connect() as connection:
+        return (
+            connection.scalar(select(func.count(Ascent.id))),
+            connection.scalar(select(func.count(Area.id))),
+        )
+
+
+def test_second_import_inserts_nothing(engine, sample_csv):
+    first = load_new_ascents_to_db(engine, sample_csv)
+    counts = count_rows(engine)
+
+    second = load_new_ascents_to_db(engine, sample_csv)
+
+    assert first.inserted > 0
+    assert first.inserted + first.duplicates == first.read
+    assert counts == (first.inserted, first.areas_created)
+    assert second.read == first.read
+    assert second.inserted == 0
+    assert second.updated == 0
+    assert second.areas_created == 0
+    assert second.unchanged == first.inserted
+    assert count_rows(engine) == counts
+
+
+def test_update_changed_updates_in_place(engine, sample_csv, tmp_path):
+    load_new_ascents_to_db(engine, sample_csv)
+    counts = count_rows(engine)
+    # Same file with a note on its first ascent
+    with open(sample_csv, encoding="utf-8-sig") as csv_file:
+        lines = csv_file.read().splitlines()
+    lines[0] += ";1;New note"
+    changed_csv = tmp_path / "changed.csv"
+    changed_csv.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    summary = load_new_ascents_to_db(
+        engine, str(changed_csv), update_changed=True
+    )
+
+    assert summary.inserted == 0
+    assert summary.updated == 1
+    assert count_rows(engine) == counts
+    with engine.connect() as connection:
+        assert connection.scalar(
+            select(func.count(Ascent.id)).where(Ascent.note == "New note")
+        ) == 1
+
+
+def test_dry_run_writes_nothing(engine, sample_csv):
+    summary = load_new_ascents_to_db(engine, sample_csv, dry_run=True)
+
+    assert summary.inserted > 0
+    assert summary.areas_created > 0
+    assert count_rows(engine) == (0, 0)
+    # The real import inserts what the dry run announced
+    assert load_new_ascents_to_db(engine, sample_csv).inserted == (
+        summary.inserted
+    )
+
+
+def test_dry_run_after_import_reports_nothing_new(engine, sample_csv):
+    load_new_ascents_to_db(engine, sample_csv)
+    counts = count_rows(engine)
+
+    summary = load_new_ascents_to_db(engine, sample_csv, dry_run=True)
+
+    assert summary.inserted == 0
+    assert count_rows(engine) == counts
+
+
+def test_update_changed_keeps_missing_columns(engine, sample_csv, tmp_path):
+    # Same ascents with a flash and a note, then the 4 columns file again
+    with open(sample_csv, encoding="utf-8-sig") as csv_file:
+        lines = csv_file.read().splitlines()
+    full_csv = tmp_path / "full.csv"
+    full_csv.write_text(
+        "\n".join(f"{line};1;great" for line in lines if line) + "\n",
+        encoding="utf-8",
+    )
+    load_new_ascents_to_db(engine, str(full_csv))
+
+    summary = load_new_ascents_to_db(engine, sample_csv, update_changed=True)
+
+    assert summary.inserted == 0
+    assert summary.updated == 0
+    with engine.connect() as connection:
+        assert connection.execute(
+            select(Ascent.flash, Ascent.note).distinct()
+        ).all() == [(True, "great")]
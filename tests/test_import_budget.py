@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from benchmarks.import_budget import (
+    DEFAULT_THRESHOLD,
+    MissingDependencyError,
+    get_imported_modules,
+    load_budgets,
+    measure_import,
+)
+
+BUDGETS = load_budgets()
+# Wall-clock times depend on the machine, they are only checked on demand
+BUDGET_ENV = "ASTAT_IMPORT_BUDGET"
+# Modules used without the UI (command line, statistics), which must not
+# load kivy
+HEADLESS_MODULES = [
+    "cli",
+    "database",
+    "database_local_management",
+    "statistic.engine",
+]
+
+
+@pytest.mark.parametrize("module", HEADLESS_MODULES)
+def test_headless_module_does_not_import_kivy(module):
+    # A missing kivy fails the import instead of being skipped
+    kivy_modules = {
+        name
+        for name in get_imported_modules(module)
+        if name.split(".")[0] in ("kivy", "kivymd")
+    }
+    assert not kivy_modules, f"import {module} loads {sorted(kivy_modules)}"
+
+
+@pytest.mark.skipif(
+    not os.environ.get(BUDGET_ENV), reason=f"set {BUDGET_ENV}=1 to run"
+)
+@pytest.mark.parametrize("module", sorted(BUDGETS))
+def test_import_time_within_budget(module):
+    # The app is skipped where kivy is not installed
+    try:
+        import_time = measure_import(module)
+    except MissingDependencyError as error:
+        pytest.skip(str(error))
+    limit = BUDGETS[module] * (1 + DEFAULT_THRESHOLD)
+    assert import_time <= limit, (
+        f"import {module} took {import_time * 1000:.1f} ms, over its budget "
+        f"of {limit * 1000:.1f} ms (see python -m benchmarks.import_budget)"
+    )
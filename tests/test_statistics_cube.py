@@ -0,0 +1,72 @@
+from datetime import date
+
+from database_local_management import load_new_ascents_to_db
+from models.area import Area
+from models.ascent import Ascent
+
+
+def assert_cube_matches_ascents(engine):
+    """The 'ascent_statistic' table equals a GROUP BY over the ascents"""
+    with engine.connect() as connection:
+        cube = connection.exec_driver_sql(
+            "SELECT area_id, grade_id, year, ascent_count, flash_count "
+            "FROM ascent_statistic ORDER BY 1, 2, 3"
+        ).all()
+        expected = connection.exec_driver_sql(
+            "SELECT area_id, grade_id, "
+            "CAST(strftime('%Y', ascent_date) AS INTEGER), count(*), "
+            "sum(CASE WHEN flash THEN 1 ELSE 0 END) "
+            "FROM ascent GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        ).all()
+    assert cube == expected
+
+
+def test_create(engine, area_ids, create_ascent):
+    create_ascent("A", area_ids["Annot"], grade_id=3, flash=True)
+    create_ascent("B", area_ids["Annot"], grade_id=3)
+    create_ascent("C", area_ids["Annot"], ascent_date=date(2019, 3, 2))
+
+    assert_cube_matches_ascents(engine)
+
+
+def test_update_moves_the_counts(engine, area_ids, create_ascent):
+    ascent_id = create_ascent("A", area_ids["Annot"], grade_id=3)
+    create_ascent("B", area_ids["Annot"], grade_id=3)
+    ascent = Ascent.get_from_id(ascent_id)
+
+    ascent.update(
+        name=ascent.name,
+        grade_id=7,
+        area_id=area_ids["Fontainebleau"],
+        ascent_date=date(2021, 8, 9),
+        flash=True,
+        note=ascent.note,
+    ).result()
+    assert_cube_matches_ascents(engine)
+
+    Ascent.bulk_update([ascent_id], flash=False).result()
+    assert_cube_matches_ascents(engine)
+
+
+def test_delete_removes_the_counts(engine, area_ids, create_ascent):
+    first_id = create_ascent("A", area_ids["Annot"], flash=True)
+    second_id = create_ascent("B", area_ids["Annot"])
+    create_ascent("C", area_ids["Fontainebleau"], grade_id=5)
+    create_ascent("D", area_ids["Fontainebleau"], grade_id=5)
+
+    Ascent.delete(first_id).result()
+    assert_cube_matches_ascents(engine)
+
+    Ascent.bulk_delete([second_id]).result()
+    assert_cube_matches_ascents(engine)
+
+    Area.delete(area_ids["Fontainebleau"]).result()
+    assert_cube_matches_ascents(engine)
+
+
+def test_import(engine, area_ids, create_ascent, sample_csv):
+    create_ascent("A", area_ids["Fontainebleau"], ascent_date=date(2014, 1, 1))
+
+    load_new_ascents_to_db(engine, sample_csv)
+
+    assert_cube_matches_ascents(engine)
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import desc, insert
+
+from models.base import get_session
+from models.grade import Grade
+from models.sector import Sector
+from models.todoclimb import ToDoClimb
+from models.todolist import ToDoList
+
+
+def create_todolist(climb_count):
+    """:return: the id of a to-do list of climbs across sectors and grades"""
+    todolist_id = ToDoList.create("Projects").result().id
+    with get_session() as session:
+        sector_ids = []
+        for name in ("Apremont", "Cuvier", "Franchard"):
+            sector = Sector(name=name, todolist_id=todolist_id)
+            session.add(sector)
+            session.flush()
+            sector_ids.append(sector.id)
+        session.execute(
+            insert(ToDoClimb),
+            [
+                {
+                    "name": f"Climb {index}",
+                    "grade_id": index % 6 + 1,
+                    # Every fourth climb has no sector
+                    "sector_id": (
+                        sector_ids[index % 3] if index % 4 else None
+                    ),
+                    "todolist_id": todolist_id,
+                    "star": False,
+                    "note": "",
+                }
+                for index in range(climb_count)
+            ],
+        )
+        session.commit()
+    return todolist_id
+
+
+def load_climbs(todolist_id):
+    """Load a to-do list as its screen does and read the displayed columns"""
+    query = ToDoClimb.list_query(todolist_id).order_by(
+        Sector.name.asc().nulls_last(), desc(Grade.correspondence)
+    )
+    with get_session() as session:
+        rows = session.execute(query).all()
+    for row in rows:
+        assert row.grade_value
+        assert row.sector_name is None or row.sector_name
+    return rows
+
+
+@pytest.mark.parametrize("climb_count", [4, 40])
+def test_load_is_one_statement(engine, count_statements, climb_count):
+    todolist_id = create_todolist(climb_count)
+
+    rows = []
+    statements = count_statements(
+        lambda: rows.extend(load_climbs(todolist_id))
+    )
+
+    assert len(rows) == climb_count
+    assert {row.sector_name for row in rows} == {
+        "Apremont",
+        "Cuvier",
+        "Franchard",
+        None,
+    }
+    assert statements == 1
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from models.ascent import Ascent
+
+
+def update_name(ascent, name, **values):
+    return ascent.update(
+        name=name,
+        grade_id=values.get("grade_id", ascent.grade_id),
+        area_id=ascent.area_id,
+        ascent_date=ascent.ascent_date,
+        flash=ascent.flash,
+        note=ascent.note,
+        check_date_updated=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "returning", [True, False], ids=["returning", "select"]
+)
+def test_checked_updates_in_a_row(
+    engine, area_ids, create_ascent, monkeypatch, returning
+):
+    # Without RETURNING, as with SQLite before 3.35
+    monkeypatch.setattr(engine.dialect, "update_returning", returning)
+    ascent = Ascent.get_from_id(create_ascent("A", area_ids["Annot"]))
+
+    assert update_name(ascent, "B").result() == 1
+    assert update_name(ascent, "C").result() == 1
+
+    stored = Ascent.get_from_id(ascent.id)
+    assert (ascent.name, ascent.date_updated) == (
+        stored.name,
+        stored.date_updated,
+    )
+
+
+def test_conflict_leaves_the_object_unchanged(
+    engine, area_ids, create_ascent
+):
+    ascent_id = create_ascent("A", area_ids["Annot"])
+    ascent = Ascent.get_from_id(ascent_id)
+    # Modified elsewhere, a second later
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE ascent SET name = 'Other', "
+            "date_updated = datetime(date_updated, '+1 second') "
+            "WHERE id = ?",
+            (ascent_id,),
+        )
+
+    with pytest.raises(StaleDataError):
+        update_name(ascent, "B").result()
+
+    assert ascent.name == "A"
+    assert Ascent.get_from_id(ascent_id).name == "Other"
+
+
+def test_failed_update_leaves_the_object_unchanged(
+    engine, area_ids, create_ascent
+):
+    ascent = Ascent.get_from_id(create_ascent("A", area_ids["Annot"]))
+    date_updated = ascent.date_updated
+
+    with pytest.raises(IntegrityError):
+        # Unknown grade, violates the foreign key
+        update_name(ascent, "B", grade_id=999).result()
+
+    assert (ascent.name, ascent.grade_id, ascent.date_updated) == (
+        "A",
+        1,
+        date_updated,
+    )
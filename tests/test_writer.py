@@ -0,0 +1,121 @@
+import threading
+from datetime import date
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+
+from models.area import Area
+from models.ascent import Ascent
+from models.writer import DatabaseWriter
+
+
+@pytest.fixture
+def writer(engine):
+    """
+    Writer not started yet: the modifications submitted before start() are
+    written in the same transaction
+    """
+    writer = DatabaseWriter(sessionmaker(bind=engine, expire_on_commit=False))
+    yield writer
+    writer.stop()
+
+
+def add_area(name):
+    def operation(session):
+        session.add(Area(name=name))
+        return name
+
+    return operation
+
+
+def fail(session):
+    raise ValueError("invalid modification")
+
+
+def get_area_names(engine):
+    with engine.connect() as connection:
+        return set(connection.scalars(select(Area.name)))
+
+
+def count_commits(engine):
+    """:return: a list growing by one item on each commit of the engine"""
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(1))
+    return commits
+
+
+def test_batch_is_one_transaction(engine, writer):
+    commits = count_commits(engine)
+    futures = [writer.submit(add_area(f"Area {index}")) for index in range(5)]
+
+    writer.start().flush()
+
+    assert [future.result() for future in futures] == [
+        f"Area {index}" for index in range(5)
+    ]
+    assert len(commits) == 1
+    assert get_area_names(engine) == {f"Area {index}" for index in range(5)}
+
+
+def test_failure_does_not_roll_back_the_batch(engine, writer):
+    results = []
+    errors = []
+    first = writer.submit(add_area("First"), callback=results.append)
+    failing = writer.submit(
+        fail, callback=results.append, error_callback=errors.append
+    )
+    last = writer.submit(add_area("Last"), callback=results.append)
+
+    writer.start().flush()
+
+    assert first.result() == "First"
+    assert last.result() == "Last"
+    with pytest.raises(ValueError, match="invalid modification"):
+        failing.result()
+    assert isinstance(failing.exception(), ValueError)
+    assert get_area_names(engine) == {"First", "Last"}
+    # The callbacks run once the futures are done
+    writer.stop()
+    assert sorted(results) == ["First", "Last"]
+    assert len(errors) == 1 and isinstance(errors[0], ValueError)
+
+
+def test_failing_statement_does_not_roll_back_the_batch(engine, writer):
+    def insert_missing_grade(session):
+        # Violates the foreign key of the grade when flushed
+        session.add(
+            Ascent(
+                name="X",
+                grade_id=999,
+                area_id=1,
+                ascent_date=date(2024, 5, 1),
+            )
+        )
+        session.flush()
+
+    first = writer.submit(add_area("First"))
+    failing = writer.submit(insert_missing_grade)
+    last = writer.submit(add_area("Last"))
+
+    writer.start().flush()
+
+    assert failing.exception() is not None
+    assert first.result() == "First" and last.result() == "Last"
+    assert get_area_names(engine) == {"First", "Last"}
+
+
+def test_flush_waits_for_the_submitted_modifications(engine, writer):
+    released = threading.Event()
+
+    def add_area_when_released(session):
+        released.wait()
+        return add_area("Slow")(session)
+
+    writer.start().submit(add_area_when_released)
+
+    assert not writer.flush(timeout=0.05)
+    assert get_area_names(engine) == set()
+    released.set()
+    assert writer.flush()
+    assert get_area_names(engine) == {"Slow"}
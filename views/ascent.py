@@ -4,17 +4,16 @@ from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.menu import MDDropdownMenu
-from kivymd.uix.pickers import MDModalDatePicker
 
 from kivy.uix.behaviors import ButtonBehavior
-from kivy.clock import Clock
 from kivy.properties import StringProperty, ObjectProperty, NumericProperty
 from kivy.metrics import dp
 
 from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 
 from models.area import Area
-from models.grade import Grade
+from models.grade import grade_registry
 from models.ascent import Ascent
 from views.snackbar import CustomSnackbar
 
@@ -33,11 +32,8 @@ class AscentScreen(MDScreen):
         "flash": "",
         "note": "",
     }
-    date_picker = ObjectProperty(MDModalDatePicker)
-
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        Clock.schedule_once(lambda *args: self.init_date_picker())
+    # Created when first opened (see show_date_picker())
+    date_picker = ObjectProperty(None, allownone=True)
 
     def on_pre_enter(self):
         # Pre filling of the form in case of an update
@@ -46,7 +42,7 @@ class AscentScreen(MDScreen):
                 self.ascent_to_update_id
             )
             area = Area.get_from_id(self.ascent_to_update.area_id)
-            grade = Grade.get_from_id(self.ascent_to_update.grade_id)
+            grade = grade_registry.get_by_id(self.ascent_to_update.grade_id)
 
             # Update UI
             self.ids.ascent_form_name.text = self.ascent_to_update.name
@@ -66,32 +62,21 @@ class AscentScreen(MDScreen):
             self.form["date"] = self.ascent_to_update.ascent_date
             self.form["note"] = self.ascent_to_update.note
 
-            # Update datepicker
-            self.date_picker.sel_day = self.ascent_to_update.ascent_date.day
-            self.date_picker.sel_month = (
-                self.ascent_to_update.ascent_date.month
-            )
-            self.date_picker.sel_year = self.ascent_to_update.ascent_date.year
-            self.date_picker.update_calendar(
-                self.date_picker.sel_year,
-                self.date_picker.sel_month,
-            )
-
     def on_leave(self):
         self.ascent_to_update_id = None
         self.ascent_to_update = None
         self.clear_all_fields()
 
     def init_date_picker(self):
+        # Imported on first use, the date picker is a heavy module
+        from kivymd.uix.pickers import MDModalDatePicker
+
         self.date_picker = MDModalDatePicker()
         self.date_picker.bind(on_ok=self.picker_on_ok)
         self.date_picker.bind(on_cancel=self.date_picker.dismiss)
 
     def open_grade_menu(self, item):
         """Function for grade dropdown menu configuration and opening"""
-        with MDApp.get_running_app().get_db_session() as session:
-            grades = session.scalars(select(Grade)).all()
-
         menu_items = [
             {
                 "text": f"{grade.grade_value}",
@@ -100,7 +85,7 @@ class AscentScreen(MDScreen):
                     g.grade_value,
                 ),
             }
-            for grade in grades
+            for grade in grade_registry.all()
         ]
         # Setup of the dropdown menu
         self.grade_menu = MDDropdownMenu(
@@ -158,7 +143,17 @@ class AscentScreen(MDScreen):
         self.area_menu.dismiss()
 
     def show_date_picker(self):
-        """Setup the date picker and open it"""
+        """Setup the date picker on the date of the form, or today, and open
+        it"""
+        if self.date_picker is None:
+            self.init_date_picker()
+        picker_date = self.form["date"] or datetime.today()
+        self.date_picker.sel_day = picker_date.day
+        self.date_picker.sel_month = picker_date.month
+        self.date_picker.sel_year = picker_date.year
+        self.date_picker.update_calendar(
+            self.date_picker.sel_year, self.date_picker.sel_month
+        )
         self.date_picker.open()
 
     def picker_on_ok(self, date_picker_instance):
@@ -216,13 +211,18 @@ class AscentScreen(MDScreen):
                 ascent_date=self.form["date"],
                 flash=self.form["flash"],
                 note=self.form["note"],
+                # Not saved if modified elsewhere since it was opened
+                check_date_updated=True,
+                callback=lambda updated: self.on_ascent_updated(),
+                error_callback=self.on_write_error,
             )
-            self.show_snackbar(text="Ascent updated successfully")
-            self.manager.current = "ascent-list"
 
         # Run if an ascent is currently being created
         else:
-            with MDApp.get_running_app().get_db_session() as session:
+            app = MDApp.get_running_app()
+            # The ascents submitted just before are checked too
+            app.get_db_writer().flush()
+            with app.get_db_session() as session:
                 ascent_existence_check = session.scalar(
                     select(Ascent).where(
                         Ascent.name == self.form["name"],
@@ -248,11 +248,34 @@ class AscentScreen(MDScreen):
                 ascent_date=self.form["date"],
                 flash=self.form["flash"],
                 note=self.form["note"],
+                callback=lambda result: self.on_ascent_created(),
+                error_callback=self.on_write_error,
+            )
+
+    def on_ascent_created(self):
+        """Called once the new ascent is saved"""
+        # Show snackbar for user feedback
+        self.show_snackbar(text="Ascent added successfully")
+        # Reset all fields
+        self.submit_clear_fields()
+
+    def on_ascent_updated(self):
+        """Called once the ascent is saved, back to the list"""
+        self.show_snackbar(text="Ascent updated successfully")
+        self.manager.current = "ascent-list"
+
+    def on_write_error(self, error):
+        """Called when the ascent could not be saved, the form is kept"""
+        if isinstance(error, StaleDataError):
+            # The ascent was modified or deleted since the form was opened:
+            # back to the list, which shows its current state
+            self.show_snackbar(
+                text="This ascent was modified or deleted meanwhile, your "
+                "changes were not saved"
             )
-            # Show snackbar for user feedback
-            self.show_snackbar(text="Ascent added successfully")
-            # Reset all fields
-            self.submit_clear_fields()
+            self.manager.current = "ascent-list"
+            return
+        self.show_snackbar(text="The ascent could not be saved")
 
     def show_snackbar(self, text):
         """Function displaying a snackbar for user feedback"""
@@ -281,14 +304,6 @@ class AscentScreen(MDScreen):
         self.ids.ascent_form_date_picker.text = "Date"
         self.ids.ascent_form_note.text = ""
         self.ids.ascent_form_flash_checkbox.active = False
-        # Reset the date_picker on today
-        today = datetime.today()
-        self.date_picker.sel_day = today.day
-        self.date_picker.sel_month = today.month
-        self.date_picker.sel_year = today.year
-        self.date_picker.update_calendar(
-            self.date_picker.sel_year, self.date_picker.sel_month
-        )
         # Reset form
         for key in self.form:
             self.form[key] = ""
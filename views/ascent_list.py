@@ -1,46 +1,71 @@
-from sqlalchemy import select, desc
-
 from kivymd.app import MDApp
 from kivy.clock import Clock
 from kivy.properties import StringProperty, BooleanProperty, NumericProperty
 from kivymd.uix.screen import MDScreen
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.widget import Widget
 from kivymd.uix.label import MDLabel
-from kivymd.uix.dialog import (
-    MDDialog,
-    MDDialogIcon,
-    MDDialogHeadlineText,
-    MDDialogContentContainer,
-    MDDialogButtonContainer,
-)
-from kivymd.uix.button import MDButton, MDButtonText
-from kivymd.uix.divider import MDDivider
 from kivy.uix.behaviors import ButtonBehavior
 from kivy.metrics import dp
 
 from kivymd.uix.segmentedbutton import MDSegmentedButton
 
+from sqlalchemy import select
+
 from models.area import Area
 from models.ascent import Ascent
-from models.grade import Grade
+from models.grade import grade_registry
+from search import is_refinement, matches, tokenize
+from views.background import BackgroundQuery
+from views.selection import SelectableListMixin
+from views.snackbar import CustomSnackbar
 
 
-class AscentListScreen(MDScreen):
+class AscentListScreen(SelectableListMixin, MDScreen):
     """Screen for the list of ascents"""
 
+    recycleview_id = "ascent_list"
+    rows_attribute = "ascents_data"
+
+    # Delay (in seconds) without typing before a search is run
+    SEARCH_DEBOUNCE_DELAY = 0.3
+    # Number of ascents loaded at once, the next page is loaded when the
+    # list is scrolled below NEXT_PAGE_SCROLL_Y
+    PAGE_SIZE = 100
+    NEXT_PAGE_SCROLL_Y = 0.2
+
     ascents_data = []
+    search_in_note = BooleanProperty(False)
     _initialized = False
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Adding of a delay: Loading of the list after setup of the layout
+        # Loading state of the list. The entries of the last load are kept
+        # as (group_label, ascent_data) to narrow them in memory when the
+        # search input is refined. The list is loaded page by page, from the
+        # sort key of the last loaded row.
+        self._load_query = None
+        self._search_event = None
+        self._loaded_entries = []
+        self._loaded_search = None
+        self._loaded_context = None
+        self._list_query = None
+        self._list_by_grade = False
+        self._group_label_getter = None
+        self._page_key = None
+        self._list_complete = True
+        # Adding of a delay: binding after setup of the layout. The list is
+        # loaded when the screen is entered (see on_pre_enter())
         Clock.schedule_once(lambda dt: self.binds())
-        Clock.schedule_once(lambda dt: self.load_by_date())
         self._initialized = True
 
     def binds(self, *args):
         self.ids.area_selector.on_area_selected = self.refresh_data
+        self.ids.ascent_list.bind(scroll_y=self.on_list_scroll)
+
+    def on_list_scroll(self, recycleview, scroll_y):
+        """Load the next page when the end of the list gets close"""
+        if scroll_y <= self.NEXT_PAGE_SCROLL_Y:
+            self.load_next_page()
 
     def on_pre_enter(self):
         if self._initialized:
@@ -53,67 +78,352 @@ class AscentListScreen(MDScreen):
             Clock.schedule_once(lambda dt: get_selected_area())
             Clock.schedule_once(lambda dt: self.refresh_data())
 
-    def load_ascents(self, ordered_query, group_label_getter):
+    def on_search_text(self):
+        """
+        Called on every keystroke in the search field. The search is only run
+        once the user stops typing for SEARCH_DEBOUNCE_DELAY.
+        """
+        if self._search_event is not None:
+            self._search_event.cancel()
+        self._search_event = Clock.schedule_once(
+            lambda dt: self.search(), self.SEARCH_DEBOUNCE_DELAY
+        )
+
+    def search(self):
+        """
+        Update the list with the current search input. When the input only
+        refines the search of the displayed list, the displayed list is
+        narrowed in memory instead of querying the database again, as long
+        as every page of the list is loaded.
+        """
+        self._search_event = None
+        search_input = self.ids.search_field.text
+
+        if (
+            self._load_query is None
+            and self._list_complete
+            and self._loaded_search is not None
+            and self._loaded_context == self.get_load_context()
+            and not self.search_in_note
+            and is_refinement(self._loaded_search, search_input)
+        ):
+            tokens = tokenize(search_input)
+            entries = [
+                (group, ascent)
+                for group, ascent in self._loaded_entries
+                if matches(tokens, ascent["name"])
+            ]
+            self.display_ascents(entries, search_input, self._loaded_context)
+        else:
+            self.refresh_data()
+
+    def get_load_context(self):
+        """Filters, other than the search input, of the displayed list"""
+        return (
+            self.ids.area_selector.ids.selected_area.text,
+            self.ids.sort_by_date.active,
+            self.search_in_note,
+        )
+
+    def load_ascents(self, query, by_grade, group_label_getter):
         """
-        Load all of the ascents into a list (RecycleView)
+        Load the ascents into a list (RecycleView), starting with the first
+        page. The queries run on a worker thread, any load still in progress
+        is cancelled.
 
         Parameters:
-        ordered_query: Query for the database, already ordered.
+        query: Query for the database (see Ascent.list_query()), unordered.
+        by_grade: Whether the list is sorted by grade instead of by date (see
+        Ascent.list_page()).
         group_label_getter: Lambda function used to get the category label
-        values
+        values from a row of the query
         """
-        with MDApp.get_running_app().get_db_session() as session:
-            # Query the ascents with the right ordering requirement
-            ascents = session.scalars(ordered_query).all()
-
-            previous_group = None
-            self.ascents_data = []
-
-            for ascent in ascents:
-                # Get the group of the new index of ascent.
-                current_group = group_label_getter(ascent)
-                # If it is a new group, add the group to the ascent_data for
-                # display
-                if previous_group != current_group:
-                    self.ascents_data.append(
-                        {
-                            "id": 0,
-                            "name": str(current_group),
-                            "grade": "",
-                            "area": "",
-                            "date": "",
-                            "flash": False,
-                            "note": "",
-                            "is_group": True,
-                        }
-                    )
-                    previous_group = current_group
-                # Add the ascent to the ascent_data for display in RecycleView
-                self.ascents_data.append(
+        if self._search_event is not None:
+            self._search_event.cancel()
+            self._search_event = None
+        if self._load_query is not None:
+            self._load_query.cancel()
+            self._load_query = None
+
+        self._list_query = query
+        self._list_by_grade = by_grade
+        self._group_label_getter = group_label_getter
+        self._page_key = None
+        self._list_complete = False
+        self.load_next_page(
+            search_input=self.ids.search_field.text,
+            load_context=self.get_load_context(),
+        )
+
+    def load_next_page(self, search_input=None, load_context=None):
+        """
+        Load the next page of the list on a worker thread.
+        When a search input and a load context are given, the page is the
+        first one and replaces the displayed list.
+        """
+        if self._load_query is not None or self._list_complete:
+            return
+
+        query = self._list_query
+        by_grade = self._list_by_grade
+        group_label_getter = self._group_label_getter
+        page_key = self._page_key
+        page_size = self.PAGE_SIZE
+
+        def query_page(session):
+            # Query the displayed columns of the next ascents
+            rows = Ascent.list_page(
+                session, query, by_grade, after=page_key, limit=page_size
+            )
+            entries = [
+                (
+                    group_label_getter(row),
                     {
-                        "id": ascent.id,
-                        "name": ascent.name,
-                        "grade": ascent.grade.grade_value,
-                        "area": ascent.area.name,
-                        "date": str(ascent.ascent_date),
-                        "flash": ascent.flash,
-                        "note": ascent.note,
+                        "id": row.id,
+                        "name": row.name,
+                        "grade": row.grade_value,
+                        "area": row.area_name,
+                        "date": str(row.ascent_date),
+                        "flash": row.flash,
                         "is_group": False,
+                        "selected": False,
                         "refresh_callback": self.refresh_recycleview,
-                    }
+                        "selection_callback": self.select_row,
+                    },
                 )
+                for row in rows
+            ]
+            next_page_key = (
+                Ascent.list_sort_key(rows[-1], by_grade) if rows else None
+            )
+            return entries, next_page_key, len(rows) < page_size
+
+        def on_page_loaded(result):
+            entries, self._page_key, self._list_complete = result
+            if load_context is None:
+                self.append_ascents(entries)
+            else:
+                self.display_ascents(entries, search_input, load_context)
+
+        self._load_query = BackgroundQuery(query_page, on_page_loaded).start()
+
+    def display_ascents(self, entries, search_input, load_context):
+        """
+        Display the loaded ascents in the RecycleView, in place of the
+        displayed ones
+
+        Parameters:
+        entries: List of (group_label, ascent_data), already ordered.
+        search_input: Search input the entries match.
+        load_context: Other filters the entries match (see
+        get_load_context()).
+        """
+        self._loaded_entries = []
+        self._loaded_search = search_input
+        self._loaded_context = load_context
+        self.ascents_data = []
+        self.selected_count = 0
+        self.append_ascents(entries, keep_scroll=False)
+        self.ids.ascent_list.scroll_y = 1
+
+    def append_ascents(self, entries, keep_scroll=True):
+        """
+        Add ascents at the end of the RecycleView, with a group row each time
+        the group label changes, including between two pages
+
+        Parameters:
+        entries: List of (group_label, ascent_data), ordered after the
+        displayed ones.
+        keep_scroll: Whether the displayed rows must stay in place.
+        """
+        self._load_query = None
+        previous_group = (
+            self._loaded_entries[-1][0] if self._loaded_entries else None
+        )
+        self._loaded_entries.extend(entries)
 
+        rows = []
+        for current_group, ascent in entries:
+            # If it is a new group, add the group to the rows for display
+            if previous_group != current_group:
+                rows.append(
+                    {
+                        "id": 0,
+                        "name": str(current_group),
+                        "grade": "",
+                        "area": "",
+                        "date": "",
+                        "flash": False,
+                        "is_group": True,
+                        "selected": False,
+                    }
+                )
+                previous_group = current_group
+            # Add the ascent to the rows for display in RecycleView
+            rows.append(ascent)
+        # A new list is assigned so that the RecycleView sees the change
+        self.ascents_data = self.ascents_data + rows
+
+        if keep_scroll:
+            self.keep_scroll_position(
+                lambda: setattr(
+                    self.ids.ascent_list, "data", self.ascents_data
+                )
+            )
+        else:
             self.ids.ascent_list.data = self.ascents_data
 
+    def keep_scroll_position(self, update_data):
+        """
+        Update the data of the RecycleView without moving the displayed rows
+        (scroll_y is relative to the height of the list, which grows with
+        each page)
+        """
+        recycleview = self.ids.ascent_list
+        scrollable_height = (
+            recycleview.layout_manager.height - recycleview.height
+        )
+        scrolled = (1 - recycleview.scroll_y) * max(scrollable_height, 0)
+        update_data()
+
+        def restore_scroll(dt):
+            scrollable_height = (
+                recycleview.layout_manager.height - recycleview.height
+            )
+            if scrollable_height > 0:
+                recycleview.scroll_y = max(1 - scrolled / scrollable_height, 0)
+
+        Clock.schedule_once(restore_scroll)
+
     def refresh_recycleview(self, popped_id):
         """Refresh the RecycleView when an ascent is deleted."""
-        # Pop the deleted ascent from the ascent_data list
-        self.ascents_data = [
-            ascent for ascent in self.ascents_data if ascent["id"] != popped_id
+        self.remove_rows([popped_id])
+
+    def remove_rows(self, ids):
+        ids = set(ids)
+        self._loaded_entries = [
+            (group, ascent)
+            for group, ascent in self._loaded_entries
+            if ascent["id"] not in ids
         ]
-        # Update the data of the RecycleView with the ascent_data
-        self.ids.ascent_list.data = self.ascents_data
-        self.ids.ascent_list.refresh_from_data()
+        super().remove_rows(ids)
+
+    def bulk_delete(self):
+        """Delete all the selected ascents"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No ascent selected")
+            return
+
+        def on_deleted(deleted):
+            self.remove_rows(ids)
+            self.show_snackbar(text=f"{deleted} ascents deleted")
+
+        def delete_ascents():
+            Ascent.bulk_delete(
+                ids, callback=on_deleted, error_callback=self.on_bulk_error
+            )
+
+        self.show_bulk_delete_dialog(
+            f"Delete {len(ids)} ascents ?", delete_ascents
+        )
+
+    def bulk_move(self, item):
+        """Move all the selected ascents to another area"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No ascent selected")
+            return
+        with MDApp.get_running_app().get_db_session() as session:
+            areas = session.execute(
+                select(Area.id, Area.name).order_by(Area.name)
+            ).all()
+        area_names = dict(areas)
+
+        def on_moved(area_id):
+            area = area_names[area_id]
+            area_filter = self.ids.area_selector.ids.selected_area.text
+            # The moved ascents no longer match the area filter
+            if area_filter not in ("All", area):
+                self.remove_rows(ids)
+            else:
+                self.patch_rows(ids, area=area)
+                self.clear_selection()
+
+        def move_ascents(area_id):
+            Ascent.bulk_update(
+                ids,
+                callback=lambda updated: on_moved(area_id),
+                error_callback=self.on_bulk_error,
+                area_id=area_id,
+            )
+
+        self.open_bulk_menu(item, areas, move_ascents)
+
+    def bulk_regrade(self, item):
+        """Change the grade of all the selected ascents"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No ascent selected")
+            return
+
+        def on_regraded(grade_id):
+            # The grade groups of the list change: reload it
+            if self.ids.sort_by_grade.active:
+                self.refresh_data()
+            else:
+                self.patch_rows(
+                    ids,
+                    grade=grade_registry.get_by_id(grade_id).grade_value,
+                )
+                self.clear_selection()
+
+        def regrade_ascents(grade_id):
+            Ascent.bulk_update(
+                ids,
+                callback=lambda updated: on_regraded(grade_id),
+                error_callback=self.on_bulk_error,
+                grade_id=grade_id,
+            )
+
+        self.open_bulk_menu(
+            item,
+            [(grade.id, grade.grade_value) for grade in grade_registry.all()],
+            regrade_ascents,
+        )
+
+    def bulk_toggle_flash(self):
+        """
+        Flash all the selected ascents, or unflash them if they all are
+        flashed already
+        """
+        rows = self.get_selected_rows()
+        if not rows:
+            self.show_snackbar(text="No ascent selected")
+            return
+        ids = [row["id"] for row in rows]
+        flash = not all(row["flash"] for row in rows)
+
+        def on_flashed(updated):
+            self.patch_rows(ids, flash=flash)
+            self.clear_selection()
+
+        Ascent.bulk_update(
+            ids,
+            callback=on_flashed,
+            error_callback=self.on_bulk_error,
+            flash=flash,
+        )
+
+    def show_snackbar(self, text):
+        snackbar = CustomSnackbar(text=text)
+        snackbar.open()
+
+    def toggle_search_in_note(self):
+        """Switch the search field between ascent names and ascent notes"""
+        self.search_in_note = not self.search_in_note
+        if self.ids.search_field.text:
+            self.refresh_data()
 
     def refresh_data(self):
         if self.ids.sort_by_date.active:
@@ -123,43 +433,29 @@ class AscentListScreen(MDScreen):
 
     def load_by_date(self):
         """Load data in the RecycleView ordered by dates"""
-        query = self.get_filtered_query()
-        # Adding ordering to the query
-        query = query.order_by(desc(Ascent.ascent_date))
-        # Call of load_ascent with the right lambda function
+        # Call of load_ascent with the ordering and the right lambda function
         self.load_ascents(
-            ordered_query=query,
-            group_label_getter=lambda ascent: ascent.ascent_date.year,
+            query=self.get_filtered_query(),
+            by_grade=False,
+            group_label_getter=lambda row: row.ascent_date.year,
         )
 
     def load_by_grade(self):
         """Load data in the RecycleView ordered by grades"""
-        query = self.get_filtered_query()
-        # Adding of the ordering to the query
-        query = query.join(Ascent.grade).order_by(
-            desc(Grade.correspondence),
-            desc(Ascent.ascent_date),
-        )
-        # Call of load_ascent with the right lambda function
+        # Call of load_ascent with the ordering and the right lambda function
         self.load_ascents(
-            ordered_query=query,
-            group_label_getter=lambda ascent: ascent.grade.grade_value,
+            query=self.get_filtered_query(),
+            by_grade=True,
+            group_label_getter=lambda row: row.grade_value,
         )
 
     def get_filtered_query(self):
-        """Get the base area filtered query for the database"""
-        # Area filter
-        area = self.ids.area_selector.ids.selected_area.text
-        if area == "All":
-            query = select(Ascent)
-        else:
-            query = select(Ascent).where(Area.name == area).join(Ascent.area)
-
-        # Search filter
-        search_input = self.ids.search_field.text
-        query = query.where(Ascent.name.like(f"%{search_input}%"))
-
-        return query
+        """Get the base area and search filtered query for the database"""
+        return Ascent.list_query(
+            area=self.ids.area_selector.ids.selected_area.text,
+            search_text=self.ids.search_field.text,
+            in_note=self.search_in_note,
+        )
 
 
 class AscentItem(MDBoxLayout):
@@ -173,15 +469,36 @@ class AscentItem(MDBoxLayout):
     flash = BooleanProperty()
     note = StringProperty()
     is_group = BooleanProperty()
+    selected = BooleanProperty(False)
 
-    def __init__(self, refresh_callback=None, **kwargs):
+    def __init__(
+        self, refresh_callback=None, selection_callback=None, **kwargs
+    ):
         super().__init__(**kwargs)
         self.refresh_callback = refresh_callback  # Store the callback
+        # selection_callback handles the clicks in selection mode
+        self.selection_callback = selection_callback
+
+    def on_name_release(self):
+        """Select the ascent in selection mode, otherwise show its details"""
+        if self.is_group:
+            return
+        if self.selection_callback and self.selection_callback(self.id):
+            return
+        self.show_info_dialog()
 
     def delete_item(self):
         """Function to delete an Ascent from the list and from the database"""
-        Ascent.delete(self.id)
-        self.refresh_callback(self.id)
+        # The item may be recycled for another row before the deletion ends
+        ascent_id = self.id
+        refresh_callback = self.refresh_callback
+        Ascent.delete(
+            ascent_id,
+            callback=lambda result: refresh_callback(ascent_id),
+            error_callback=lambda error: CustomSnackbar(
+                text="The ascent could not be deleted"
+            ).open(),
+        )
 
     def show_info_dialog(self):
         """Show a dialog window with full details of an ascent when the name of
@@ -189,9 +506,23 @@ class AscentItem(MDBoxLayout):
         if self.is_group:
             return
 
+        # Imported on first use: the dialogs are not needed to display the
+        # list at startup
+        from kivymd.uix.button import MDButton, MDButtonText
+        from kivymd.uix.dialog import (
+            MDDialog,
+            MDDialogButtonContainer,
+            MDDialogContentContainer,
+            MDDialogHeadlineText,
+        )
+        from kivymd.uix.divider import MDDivider
+        from kivymd.uix.widget import Widget
+
         app = MDApp.get_running_app()
 
-        self.note = self.note if self.note else " "
+        # The note is not part of the list data, it is only loaded here
+        ascent = Ascent.get_from_id(self.id)
+        self.note = ascent.note if ascent and ascent.note else " "
 
         self.info_dialog = MDDialog(
             MDDialogHeadlineText(text="Ascent Details"),
@@ -240,6 +571,15 @@ class AscentItem(MDBoxLayout):
         self.info_dialog.open()
 
     def show_delete_dialog(self):
+        from kivymd.uix.button import MDButton, MDButtonText
+        from kivymd.uix.dialog import (
+            MDDialog,
+            MDDialogButtonContainer,
+            MDDialogHeadlineText,
+            MDDialogIcon,
+        )
+        from kivymd.uix.widget import Widget
+
         self.delete_dialog = MDDialog(
             MDDialogIcon(icon="delete"),
             MDDialogHeadlineText(text="Delete this ascent ?"),
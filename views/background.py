@@ -0,0 +1,81 @@
+import threading
+
+from kivymd.app import MDApp
+from kivy.clock import Clock
+from kivy.logger import Logger
+
+from diagnostics.sql import sql_instrumentation
+
+
+class BackgroundQuery:
+    """
+    Run a database query on a worker thread and post its result back on the
+    Kivy main thread.
+
+    The query function receives its own session and its result is given to
+    the callback, unless the query has been cancelled in the meantime. A
+    cancelled query still running in SQLite is interrupted. If the query
+    fails, the optional error callback receives the exception. Its SQL
+    statements are attributed to the action which created it.
+
+    The modifications queued on the DatabaseWriter are committed before the
+    query runs, so it reads them without blocking the main thread.
+    """
+
+    def __init__(self, query_function, callback, error_callback=None):
+        self.query_function = query_function
+        self.callback = callback
+        self.error_callback = error_callback
+        self.cancelled = False
+        self._dbapi_connection = None
+        self._lock = threading.Lock()
+        self._sql_action = sql_instrumentation.get_action()
+
+    def start(self):
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        return self
+
+    def cancel(self):
+        """Discard the result of the query and interrupt it if running"""
+        with self._lock:
+            self.cancelled = True
+            if self._dbapi_connection is not None:
+                self._dbapi_connection.interrupt()
+
+    def _run(self):
+        app = MDApp.get_running_app()
+        app.get_db_writer().flush()
+        try:
+            with sql_instrumentation.action(
+                self._sql_action
+            ), app.get_db_session() as session:
+                with self._lock:
+                    if self.cancelled:
+                        return
+                    self._dbapi_connection = (
+                        session.connection().connection.dbapi_connection
+                    )
+                try:
+                    result = self.query_function(session)
+                finally:
+                    with self._lock:
+                        self._dbapi_connection = None
+        except Exception as error:
+            # An interrupted query raises an OperationalError, only report
+            # the failures of queries which are still expected
+            if not self.cancelled:
+                Logger.exception("BackgroundQuery: query failed")
+                if self.error_callback is not None:
+                    Clock.schedule_once(
+                        lambda dt, error=error: self._deliver(
+                            error, self.error_callback
+                        )
+                    )
+            return
+
+        Clock.schedule_once(lambda dt: self._deliver(result, self.callback))
+
+    def _deliver(self, result, callback):
+        if not self.cancelled:
+            callback(result)
@@ -66,8 +66,11 @@ class LocationForm(MDBoxLayout):
         if location_name == "":
             self.show_snackbar(text="Form Incomplete")
             return
-        # Check if an Area with this name already exist
-        with MDApp.get_running_app().get_db_session() as session:
+        # Check if an Area with this name already exist, including the
+        # locations submitted just before
+        app = MDApp.get_running_app()
+        app.get_db_writer().flush()
+        with app.get_db_session() as session:
             if self.model_class == Area:
                 if session.scalar(
                     select(self.model_class).filter_by(name=location_name)
@@ -84,33 +87,47 @@ class LocationForm(MDBoxLayout):
                     self.show_snackbar(text="Sector already exists")
                     return
 
+        location_type = "Area" if self.model_class == Area else "Sector"
         if not self.location_to_update:
             # Create Area
             if self.model_class == Area:
-                Area.create(name=location_name)
-                self.show_snackbar(text="Area created successfully")
+                Area.create(
+                    name=location_name,
+                    callback=lambda result: self.on_location_saved(
+                        "Area created successfully"
+                    ),
+                    error_callback=lambda error: self.show_snackbar(
+                        text="The area could not be created"
+                    ),
+                )
             # Create Sector
             else:
                 Sector.create(
                     name=location_name,
                     todolist_id=self.todolist_id,
+                    callback=lambda result: self.on_location_saved(
+                        "Sector created successfully"
+                    ),
+                    error_callback=lambda error: self.show_snackbar(
+                        text="The sector could not be created"
+                    ),
                 )
-                self.show_snackbar(text="Sector created successfully")
-            self.list_refresh()
 
         else:
-            # Update Area
-            if self.model_class == Area:
-                self.location_to_update.update(name=location_name)
-                self.show_snackbar(text="Area renamed successfully")
-            # Update Sector
-            else:
-                self.location_to_update.update(
-                    name=location_name,
-                )
-                self.show_snackbar(text="Sector renamed successfully")
-            self.list_refresh()
+            self.location_to_update.update(
+                name=location_name,
+                callback=lambda updated: self.on_location_saved(
+                    f"{location_type} renamed successfully"
+                ),
+                error_callback=lambda error: self.show_snackbar(
+                    text=f"The {location_type.lower()} could not be renamed"
+                ),
+            )
 
+    def on_location_saved(self, text):
+        """Called once the location is saved: reload the list"""
+        self.show_snackbar(text=text)
+        self.list_refresh()
         self.clear_field()
 
     def show_snackbar(self, text):
@@ -235,5 +252,10 @@ class LocationItem(MDBoxLayout):
     def delete_location(self):
         """Delete the area from the database and from the area delete list in
         the app"""
-        self.model_class.delete(id=self.location.id)
-        self.refresh_callback(self.location.name)
+        self.model_class.delete(
+            id=self.location.id,
+            callback=lambda result: self.refresh_callback(self.location.name),
+            error_callback=lambda error: CustomSnackbar(
+                text=f"{self.location.name} could not be deleted"
+            ).open(),
+        )
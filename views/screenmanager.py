@@ -1,7 +1,147 @@
+from collections import namedtuple
+from importlib import import_module
+
 from kivymd.uix.navigationbar import MDNavigationItem
 from kivymd.uix.boxlayout import MDBoxLayout
+from kivymd.uix.screenmanager import MDScreenManager
+from kivy.clock import Clock
+from kivy.lang import Builder
 from kivy.properties import StringProperty
 
+from diagnostics.sql import sql_instrumentation
+from diagnostics.startup import startup_tracer
+
+# Events of the screens their SQL statements are attributed to
+INSTRUMENTED_SCREEN_EVENTS = ("on_pre_enter", "on_enter", "on_pre_leave")
+
+# How to build a screen: the modules defining the widgets of its rules (the
+# screen class being in the first one) and its .kv files. A spec lists every
+# class and every rule used by its .kv files, so a screen can be built
+# first whatever the screens built before it.
+ScreenSpec = namedtuple("ScreenSpec", ["modules", "class_name", "kv_files"])
+
+SCREENS = {
+    "ascent-list": ScreenSpec(
+        ["views.ascent_list", "views.selector"],
+        "AscentListScreen",
+        ["kv/selector.kv", "kv/ascent-list-screen.kv"],
+    ),
+    "ascent": ScreenSpec(
+        ["views.ascent"], "AscentScreen", ["kv/ascent-screen.kv"]
+    ),
+    "location": ScreenSpec(
+        ["views.location"], "LocationScreen", ["kv/location-screen.kv"]
+    ),
+    "statistic": ScreenSpec(
+        ["views.statistics", "views.barchart"],
+        "StatisticScreen",
+        ["kv/barchart.kv", "kv/statistic-screen.kv"],
+    ),
+    # The AreaSelector of selector.kv uses the ClickableMDLabel of
+    # views.ascent_list
+    "statistic-filter": ScreenSpec(
+        ["views.statistics_filter", "views.selector", "views.ascent_list"],
+        "StatisticFilterScreen",
+        ["kv/selector.kv", "kv/statistic-filter-screen.kv"],
+    ),
+    # The dialogs use the DialogScrollableItem of ascent-list-screen.kv
+    "settings": ScreenSpec(
+        ["views.settings", "views.ascent_list"],
+        "SettingsScreen",
+        ["kv/ascent-list-screen.kv", "kv/settings-screen.kv"],
+    ),
+    "todolist": ScreenSpec(
+        ["views.todolist"], "ToDoListScreen", ["kv/todolist-screen.kv"]
+    ),
+    # The list uses the ClickableMDLabel, CustomMDSegmentedButton and dialog
+    # items of views.ascent_list and ascent-list-screen.kv
+    "todolist-detail": ScreenSpec(
+        ["views.todolist_detail", "views.ascent_list"],
+        "ToDoListDetailScreen",
+        ["kv/ascent-list-screen.kv", "kv/todolist-detail-screen.kv"],
+    ),
+    "todolist-add": ScreenSpec(
+        ["views.todolist_add"],
+        "ToDoListAddScreen",
+        ["kv/todolist-add-screen.kv"],
+    ),
+    # The form uses the DropDownMenuHeader of views.ascent and
+    # ascent-screen.kv
+    "todoclimb": ScreenSpec(
+        ["views.todoclimb", "views.ascent"],
+        "ToDoClimbScreen",
+        ["kv/ascent-screen.kv", "kv/todoclimb-screen.kv"],
+    ),
+}
+# Screen displayed at startup
+INITIAL_SCREEN = "ascent-list"
+# Screens built in advance after startup, one per frame, from WARM_UP_DELAY
+# seconds after the first frame. The others are built on first navigation.
+WARM_UP_SCREENS = ["statistic", "todolist", "settings", "ascent"]
+WARM_UP_DELAY = 1
+
+# .kv files already loaded, a file is only loaded once
+_loaded_kv_files = set()
+
+
+def load_kv_files(kv_files):
+    for kv_file in kv_files:
+        if kv_file not in _loaded_kv_files:
+            with startup_tracer.phase(f"kv:{kv_file}"):
+                Builder.load_file(kv_file)
+            _loaded_kv_files.add(kv_file)
+
+
+def instrument_screen(screen):
+    """
+    Attribute the SQL statements run from the events of a screen, and until
+    the next one, to that event (e.g. 'StatisticScreen.on_enter').
+    The bound callbacks are dispatched before the handlers of the screen.
+    """
+    for event_name in INSTRUMENTED_SCREEN_EVENTS:
+        screen.fbind(
+            event_name,
+            set_sql_action,
+            f"{type(screen).__name__}.{event_name}",
+        )
+
+
+def set_sql_action(action, *args):
+    sql_instrumentation.set_action(action)
+
+
+class LazyScreenManager(MDScreenManager):
+    """
+    Screen manager building the screens of SCREENS on first use: their
+    modules are imported, their .kv files loaded and the screen created when
+    it is first displayed or asked for with get_screen().
+    """
+
+    def get_screen(self, name):
+        if name in SCREENS and not self.is_built(name):
+            self.build_screen(name)
+        return super().get_screen(name)
+
+    def has_screen(self, name):
+        return name in SCREENS or super().has_screen(name)
+
+    def is_built(self, name):
+        return super().has_screen(name)
+
+    def build_screen(self, name):
+        spec = SCREENS[name]
+        with startup_tracer.phase(f"import:{name}"):
+            screen_module = import_module(spec.modules[0])
+            for module in spec.modules[1:]:
+                import_module(module)
+        load_kv_files(spec.kv_files)
+
+        with startup_tracer.phase(f"screen:{name}"):
+            screen = getattr(screen_module, spec.class_name)(name=name)
+            instrument_screen(screen)
+            self.add_widget(screen)
+        return screen
+
 
 class BaseMDNavigationItem(MDNavigationItem):
     icon = StringProperty()
@@ -14,6 +154,19 @@ class MainScreenManager(MDBoxLayout):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Only the first screen is built before the first frame
+        self.ids.screen_manager.current = INITIAL_SCREEN
+        Clock.schedule_once(self.warm_up_screens, WARM_UP_DELAY)
+
+    def warm_up_screens(self, *args):
+        """Build the next screen of WARM_UP_SCREENS not built yet"""
+        screen_manager = self.ids.screen_manager
+        for name in WARM_UP_SCREENS:
+            if not screen_manager.is_built(name):
+                screen_manager.build_screen(name)
+                # The next one on the next frame
+                Clock.schedule_once(self.warm_up_screens)
+                return
 
     def on_switch_tabs(self, item: BaseMDNavigationItem):
         self.ids.screen_manager.current = item.name
@@ -0,0 +1,167 @@
+from kivy.properties import BooleanProperty, NumericProperty
+from kivy.metrics import dp
+
+
+class SelectableListMixin:
+    """
+    Multi-selection of the rows of the RecycleView of a list screen.
+
+    The rows are the dictionaries of the RecycleView data: group rows have
+    'is_group' set, the other rows have an 'id' and a 'selected' key. The
+    rows are patched in place after a bulk action instead of reloading the
+    list.
+
+    The screen defines recycleview_id, the id of its RecycleView,
+    rows_attribute, the name of its attribute holding the rows, and
+    show_snackbar() to report the failed bulk actions.
+    """
+
+    recycleview_id = ""
+    rows_attribute = ""
+    selection_mode = BooleanProperty(False)
+    selected_count = NumericProperty(0)
+
+    def get_recycleview(self):
+        return self.ids[self.recycleview_id]
+
+    def get_rows(self):
+        return getattr(self, self.rows_attribute)
+
+    def set_rows(self, rows):
+        setattr(self, self.rows_attribute, rows)
+        self.get_recycleview().data = rows
+
+    def toggle_selection_mode(self):
+        """Enter or leave the selection mode, which clears the selection"""
+        self.clear_selection()
+        self.selection_mode = not self.selection_mode
+
+    def select_row(self, id):
+        """
+        Select or unselect the row of id when in selection mode. Given to
+        the items of the list as their selection_callback.
+        :return: True if the selection mode handled the click
+        """
+        if not self.selection_mode:
+            return False
+        for row in self.get_rows():
+            if not row["is_group"] and row["id"] == id:
+                row["selected"] = not row.get("selected", False)
+                self.selected_count += 1 if row["selected"] else -1
+                break
+        self.get_recycleview().refresh_from_data()
+        return True
+
+    def get_selected_rows(self):
+        return [
+            row
+            for row in self.get_rows()
+            if not row["is_group"] and row.get("selected", False)
+        ]
+
+    def get_selected_ids(self):
+        return [row["id"] for row in self.get_selected_rows()]
+
+    def clear_selection(self):
+        for row in self.get_selected_rows():
+            row["selected"] = False
+        self.selected_count = 0
+        self.get_recycleview().refresh_from_data()
+
+    def patch_rows(self, ids, **values):
+        """Update the displayed values of some rows in place"""
+        ids = set(ids)
+        for row in self.get_rows():
+            if not row["is_group"] and row["id"] in ids:
+                row.update(values)
+        self.get_recycleview().refresh_from_data()
+
+    def remove_rows(self, ids):
+        """Remove some rows from the list, and the groups left empty"""
+        ids = set(ids)
+        rows = []
+        for row in self.get_rows():
+            if row["is_group"]:
+                # Drop the previous group if none of its rows is left
+                if rows and rows[-1]["is_group"]:
+                    rows.pop()
+                rows.append(row)
+            elif row["id"] not in ids:
+                rows.append(row)
+        if rows and rows[-1]["is_group"]:
+            rows.pop()
+        self.selected_count = len(
+            [row for row in rows if row.get("selected", False)]
+        )
+        self.set_rows(rows)
+
+    def on_bulk_error(self, error):
+        """
+        Error callback of the bulk actions: nothing was modified, the rows
+        and the selection are left as they are
+        """
+        self.show_snackbar(text="The selection could not be modified")
+
+    def show_bulk_delete_dialog(self, text, on_confirm):
+        """Ask for confirmation before deleting the selected rows"""
+        # Imported on first use, like the menu of open_bulk_menu()
+        from kivymd.uix.button import MDButton, MDButtonText
+        from kivymd.uix.dialog import (
+            MDDialog,
+            MDDialogButtonContainer,
+            MDDialogHeadlineText,
+            MDDialogIcon,
+        )
+        from kivymd.uix.widget import Widget
+
+        self.bulk_delete_dialog = MDDialog(
+            MDDialogIcon(icon="delete"),
+            MDDialogHeadlineText(text=text),
+            MDDialogButtonContainer(
+                Widget(),
+                MDButton(
+                    MDButtonText(text="No"),
+                    style="text",
+                    on_release=lambda *args: self.bulk_delete_dialog.dismiss(),
+                ),
+                MDButton(
+                    MDButtonText(text="Yes"),
+                    style="text",
+                    on_release=lambda x: [
+                        on_confirm(),
+                        self.bulk_delete_dialog.dismiss(),
+                    ],
+                ),
+                Widget(),
+            ),
+            size_hint_x=0.7,
+        )
+        self.bulk_delete_dialog.open()
+
+    def open_bulk_menu(self, item, choices, callback):
+        """
+        Open a dropdown menu to pick the new value of a bulk action
+
+        Parameters:
+        choices: List of (value, text) of the menu.
+        callback: Function called with the picked value.
+        """
+        from kivymd.uix.menu import MDDropdownMenu
+
+        def pick(value):
+            self.bulk_menu.dismiss()
+            callback(value)
+
+        menu_items = [
+            {"text": text, "on_release": lambda v=value: pick(v)}
+            for value, text in choices
+        ]
+        self.bulk_menu = MDDropdownMenu(
+            caller=item,
+            items=menu_items,
+            max_height=dp(300),
+            width=dp(200),
+            position="bottom",
+            hor_growth="left",
+        )
+        self.bulk_menu.open()
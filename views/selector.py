@@ -1,6 +1,5 @@
 from kivymd.app import MDApp
 from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.menu import MDDropdownMenu
 from kivymd.uix.slider import MDSlider
 from kivy.properties import ObjectProperty, StringProperty, NumericProperty
 from kivy.metrics import dp
@@ -15,6 +14,9 @@ class AreaSelector(MDBoxLayout):
 
     def area_selection(self, item):
         """Function for grade dropdown menu configuration and opening"""
+        # Imported on first use, the selector is displayed at startup
+        from kivymd.uix.menu import MDDropdownMenu
+
         with MDApp.get_running_app().get_db_session() as session:
             areas = session.scalars(select(Area).order_by(Area.name)).all()
 
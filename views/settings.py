@@ -1,11 +1,33 @@
 import os
 import shutil
 
+from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
+from kivymd.uix.widget import Widget
+from kivymd.uix.button import MDButton, MDButtonText
+from kivymd.uix.dialog import (
+    MDDialog,
+    MDDialogHeadlineText,
+    MDDialogContentContainer,
+    MDDialogButtonContainer,
+)
 
+from diagnostics.sql import sql_instrumentation
+from views.ascent_list import DialogScrollableItem
+from views.background import BackgroundQuery
 from views.snackbar import CustomSnackbar
 from models.area import Area
-from database import get_android_documents_path, get_db_path
+from models.data_version import data_version
+from models.grade import grade_registry
+from database import (
+    checkpoint_db,
+    get_android_documents_path,
+    get_db_path,
+    get_export_dir,
+    get_sql_log_path,
+    replace_db_file,
+)
+from database_local_management import export_ascents, open_export_file
 
 
 class SettingsScreen(MDScreen):
@@ -13,6 +35,7 @@ class SettingsScreen(MDScreen):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self._export_query = None
 
     def get_area_screen(self):
         location_screen = self.manager.get_screen("location")
@@ -29,8 +52,13 @@ class SettingsScreen(MDScreen):
             )
             return
 
-        database = get_db_path()
-        shutil.copy(db_document_url, database)
+        app = MDApp.get_running_app()
+        app.get_db_writer().flush()
+        app.Session.remove()
+        data_version.close()
+        replace_db_file(app.engine, db_document_url, get_db_path())
+        data_version.bind(app.engine)
+        grade_registry.load(app.engine)
 
         self.show_snackbar(text="Database copied from the download folder")
 
@@ -39,10 +67,107 @@ class SettingsScreen(MDScreen):
         db_copy_url = os.path.join(document_path, "astat.db")
         database = get_db_path()
 
+        # Write the queued modifications, then flush the WAL file into the
+        # database file before copying it
+        app = MDApp.get_running_app()
+        app.get_db_writer().flush()
+        checkpoint_db(app.engine)
         shutil.copy(database, db_copy_url)
 
         self.show_snackbar(text="Database copied to the download folder")
 
+    def export_ascents_as_csv(self):
+        """
+        Export all the ascents to a .csv file in the download folder. The
+        export is streamed on a worker thread to keep the UI responsive.
+        """
+        if self._export_query is not None:
+            self.show_snackbar(text="An export is already running")
+            return
+
+        export_path = os.path.join(get_export_dir(), "ascents_export.csv")
+
+        def export(session):
+            with open_export_file(export_path) as export_file:
+                return export_ascents(session.connection(), export_file)
+
+        def export_done(exported):
+            self._export_query = None
+            self.show_snackbar(
+                text=f"{exported} ascents exported to {export_path}"
+            )
+
+        def export_failed(error):
+            self._export_query = None
+            self.show_snackbar(text="Export failed")
+
+        self._export_query = BackgroundQuery(
+            export, export_done, export_failed
+        ).start()
+
+    def show_sql_diagnostics(self):
+        """
+        Debug overlay of the SQL statements per screen and action: count,
+        total time, p95, most repeated and slowest statements
+        """
+        enabled = sql_instrumentation.enabled
+        self.sql_dialog = MDDialog(
+            MDDialogHeadlineText(text="SQL diagnostics"),
+            MDDialogContentContainer(
+                DialogScrollableItem(
+                    icon="database-search-outline",
+                    label=(
+                        sql_instrumentation.get_report()
+                        if enabled or sql_instrumentation.actions
+                        else "The SQL instrumentation is disabled"
+                    ),
+                ),
+                orientation="vertical",
+            ),
+            MDDialogButtonContainer(
+                Widget(),
+                MDButton(
+                    MDButtonText(text="Disable" if enabled else "Enable"),
+                    style="text",
+                    on_release=lambda *args: self.toggle_sql_diagnostics(),
+                ),
+                MDButton(
+                    MDButtonText(text="Reset"),
+                    style="text",
+                    on_release=lambda *args: [
+                        sql_instrumentation.reset(),
+                        self.sql_dialog.dismiss(),
+                        self.show_sql_diagnostics(),
+                    ],
+                ),
+                MDButton(
+                    MDButtonText(text="Save"),
+                    style="text",
+                    on_release=lambda *args: self.dump_sql_diagnostics(),
+                ),
+                MDButton(
+                    MDButtonText(text="Close"),
+                    style="text",
+                    on_release=lambda *args: self.sql_dialog.dismiss(),
+                ),
+            ),
+            size_hint_x=0.9,
+        )
+        self.sql_dialog.open()
+
+    def toggle_sql_diagnostics(self):
+        if sql_instrumentation.enabled:
+            sql_instrumentation.uninstall()
+        else:
+            sql_instrumentation.install(MDApp.get_running_app().engine)
+        self.sql_dialog.dismiss()
+        self.show_sql_diagnostics()
+
+    def dump_sql_diagnostics(self):
+        log_path = get_sql_log_path()
+        sql_instrumentation.dump(log_path)
+        self.show_snackbar(text=f"SQL diagnostics saved to {log_path}")
+
     def show_snackbar(self, text):
         """Function displaying a snackbar for user feedback"""
         snackbar = CustomSnackbar(text=text)
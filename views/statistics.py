@@ -10,6 +10,7 @@ from kivymd.uix.tab import (
 )
 from kivymd.app import MDApp
 from kivy.properties import (
+    ObjectProperty,
     StringProperty,
     ListProperty,
     BooleanProperty,
@@ -17,14 +18,10 @@ from kivy.properties import (
 )
 from kivy.clock import Clock
 
-from models.grade import Grade
-from statistic.queries import (
-    get_grade_data,
-    get_area_data,
-    get_year_data,
-    get_total_ascent,
-    get_average_grade,
-)
+from models.grade import grade_registry
+from views.background import BackgroundQuery
+from statistic.engine import Statistics
+from statistic.queries import get_statistics
 
 
 class CustomTitleLabel(MDLabel):
@@ -128,6 +125,7 @@ class StatisticScreen(MDScreen):
     max_grade_filter = NumericProperty(19)
     area_filter = StringProperty("All")
 
+    statistics = ObjectProperty(Statistics())
     total_ascents = NumericProperty(0)
     total_flash = NumericProperty(0)
     grade_data = ListProperty()
@@ -136,18 +134,21 @@ class StatisticScreen(MDScreen):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Statistics computation running on a worker thread
+        self._statistics_query = None
         Clock.schedule_once(lambda dt: self.tab_init())
 
     def on_pre_enter(self):
         """
         Actions performed when entering the screen :
         - Update of the filter display based on the current filtering setup
-        - Update of the statistic carousel by calling update_carousel()
+        - Computation of the statistics on a worker thread, the carousel is
+        updated once they are computed (see load_statistics())
         """
-        min_grade_value = Grade.get_grade_value_from_correspondence(
+        min_grade_value = grade_registry.get_grade_value_from_correspondence(
             self.min_grade_filter
         )
-        max_grade_value = Grade.get_grade_value_from_correspondence(
+        max_grade_value = grade_registry.get_grade_value_from_correspondence(
             self.max_grade_filter
         )
         self.area_filter = MDApp.get_running_app().root.selected_area
@@ -156,9 +157,48 @@ class StatisticScreen(MDScreen):
             f"   /   Area : {self.area_filter}"
         )
 
-        Clock.schedule_once(lambda x: self.update_data())
-        Clock.schedule_once(lambda x: self.carousel_update())
-        Clock.schedule_once(lambda x: self.graph_update())
+        self.load_statistics()
+
+    def on_leave(self):
+        self.cancel_statistics()
+
+    def get_filters(self):
+        return self.min_grade_filter, self.max_grade_filter, self.area_filter
+
+    def load_statistics(self):
+        """
+        Compute the statistics for the current filters on a worker thread,
+        then update the carousel and the graphs with them. A computation
+        still running for previous filters is cancelled.
+        """
+        self.cancel_statistics()
+        filters = self.get_filters()
+        min_grade_filter, max_grade_filter, area_filter = filters
+
+        def on_statistics_loaded(statistics):
+            self._statistics_query = None
+            # The filters changed since the computation started
+            if filters != self.get_filters():
+                return
+            self.update_data(statistics)
+            self.carousel_update()
+            self.graph_update()
+
+        self._statistics_query = BackgroundQuery(
+            lambda session: get_statistics(
+                min_grade_correspondence=min_grade_filter,
+                max_grade_correpondence=max_grade_filter,
+                area=area_filter,
+                session=session,
+            ),
+            on_statistics_loaded,
+        ).start()
+
+    def cancel_statistics(self):
+        """Discard the statistics computation in progress, if any"""
+        if self._statistics_query is not None:
+            self._statistics_query.cancel()
+            self._statistics_query = None
 
     def tab_init(self, *args):
         """
@@ -212,17 +252,11 @@ class StatisticScreen(MDScreen):
         Update the content of the carousel with the current filters
         """
         # Update the total number of ascents
-        self.total_ascents, self.total_flash = get_total_ascent(
-            min_grade_correspondence=self.min_grade_filter,
-            max_grade_correpondence=self.max_grade_filter,
-            area=self.area_filter,
-        )
+        self.total_ascents = self.statistics.total_ascents
+        self.total_flash = self.statistics.total_flash
         # Update the average grade
-        average_grade, average_flash_grade = get_average_grade(
-            min_grade_correspondence=self.min_grade_filter,
-            max_grade_correpondence=self.max_grade_filter,
-            area=self.area_filter,
-        )
+        average_grade = self.statistics.average_grade
+        average_flash_grade = self.statistics.average_flash_grade
 
         self.ids.general_tab.total_number_of_ascent = str(self.total_ascents)
         self.ids.general_tab.total_number_of_flash = str(self.total_flash)
@@ -334,24 +368,13 @@ class StatisticScreen(MDScreen):
         year_graph.redraw()
         area_graph.redraw()
 
-    def update_data(self):
-        self.grade_data = get_grade_data(
-            min_grade_correspondence=self.min_grade_filter,
-            max_grade_correpondence=self.max_grade_filter,
-            area=self.area_filter,
-        )
-
-        self.year_data = get_year_data(
-            min_grade_correspondence=self.min_grade_filter,
-            max_grade_correpondence=self.max_grade_filter,
-            area=self.area_filter,
-        )
+    def update_data(self, statistics):
+        """Update the data of the screen with computed statistics"""
+        self.statistics = statistics
 
-        self.area_data = get_area_data(
-            min_grade_correspondence=self.min_grade_filter,
-            max_grade_correpondence=self.max_grade_filter,
-            area=self.area_filter,
-        )
+        self.grade_data = self.statistics.grade_data
+        self.year_data = self.statistics.year_data
+        self.area_data = self.statistics.area_data
 
     def reformat_query(self, query_result):
         """Add a pourcentage column to the database query result"""
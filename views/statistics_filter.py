@@ -2,7 +2,7 @@ from kivymd.app import MDApp
 from kivymd.uix.screen import MDScreen
 from kivy.clock import Clock
 
-from models.grade import Grade
+from models.grade import grade_registry
 
 
 class StatisticFilterScreen(MDScreen):
@@ -30,7 +30,7 @@ class StatisticFilterScreen(MDScreen):
         )
 
     def grade_label_update(self, grade_selector):
-        grade = Grade.get_grade_value_from_correspondence(
+        grade = grade_registry.get_grade_value_from_correspondence(
             grade_selector.ids.slider.value + 1
         )
         grade_selector.ids.grade_value.text = grade
@@ -8,8 +8,9 @@ from kivy.properties import ObjectProperty, NumericProperty
 from kivy.metrics import dp
 
 from sqlalchemy import select
+from sqlalchemy.orm.exc import StaleDataError
 
-from models.grade import Grade
+from models.grade import grade_registry
 from models.sector import Sector
 from models.todoclimb import ToDoClimb
 from views.snackbar import CustomSnackbar
@@ -45,7 +46,7 @@ class ToDoClimbScreen(MDScreen):
             self.ids.climb_form_name.text = self.climb_to_update.name
 
             # Update grade
-            grade = Grade.get_from_id(self.climb_to_update.grade_id)
+            grade = grade_registry.get_by_id(self.climb_to_update.grade_id)
             self.ids.climb_form_grade.text = grade.grade_value
             self.form["grade_id"] = self.climb_to_update.grade_id
 
@@ -106,9 +107,6 @@ class ToDoClimbScreen(MDScreen):
 
     def open_grade_menu(self, item):
         """Function for grade dropdown menu configuration and opening"""
-        with MDApp.get_running_app().get_db_session() as session:
-            grades = session.scalars(select(Grade)).all()
-
         menu_items = [
             {
                 "text": f"{grade.grade_value}",
@@ -117,7 +115,7 @@ class ToDoClimbScreen(MDScreen):
                     g.grade_value,
                 ),
             }
-            for grade in grades
+            for grade in grade_registry.all()
         ]
         # Setup of the dropdown menu
         self.grade_menu = MDDropdownMenu(
@@ -239,9 +237,11 @@ class ToDoClimbScreen(MDScreen):
                 tag=self.form["tag"],
                 note=self.form["note"],
                 star=self.form["star"],
+                # Not saved if modified elsewhere since it was opened
+                check_date_updated=True,
+                callback=lambda updated: self.on_climb_updated(),
+                error_callback=self.on_write_error,
             )
-            self.show_snackbar(text="Ascent updated successfully")
-            self.manager.current = "todolist-detail"
         # Run if an ascent is currently being created
         else:
             ToDoClimb.create(
@@ -252,11 +252,34 @@ class ToDoClimbScreen(MDScreen):
                 note=self.form["note"],
                 todolist_id=self.form["todolist_id"],
                 star=self.form["star"],
+                callback=lambda result: self.on_climb_created(),
+                error_callback=self.on_write_error,
+            )
+
+    def on_climb_created(self):
+        """Called once the new climb is saved"""
+        # Show snackbar for user feedback
+        self.show_snackbar(text="Climb added successfully")
+        # Reset all fields
+        self.submit_clear_fields()
+
+    def on_climb_updated(self):
+        """Called once the climb is saved, back to the list"""
+        self.show_snackbar(text="Climb updated successfully")
+        self.manager.current = "todolist-detail"
+
+    def on_write_error(self, error):
+        """Called when the climb could not be saved, the form is kept"""
+        if isinstance(error, StaleDataError):
+            # The climb was modified or deleted since the form was opened:
+            # back to the list, which shows its current state
+            self.show_snackbar(
+                text="This climb was modified or deleted meanwhile, your "
+                "changes were not saved"
             )
-            # Show snackbar for user feedback
-            self.show_snackbar(text="Climb added successfully")
-            # Reset all fields
-            self.submit_clear_fields()
+            self.manager.current = "todolist-detail"
+            return
+        self.show_snackbar(text="The climb could not be saved")
 
     def show_snackbar(self, text):
         """Function displaying a snackbar for user feedback"""
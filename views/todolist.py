@@ -11,10 +11,6 @@ from models.todolist import ToDoList
 
 class ToDoListScreen(MDScreen):
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        Clock.schedule_once(lambda *args: self.init_list())
-
     def on_pre_enter(self):
         Clock.schedule_once(lambda *args: self.init_list())
 
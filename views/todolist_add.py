@@ -40,15 +40,36 @@ class ToDoListAddScreen(MDScreen):
             return
 
         if not self.todolist_to_update:
-            todolist = ToDoList.create(name=todolist_name)
-            self.show_snackbar(text="List created successfully")
+            # The detail view is opened once the list is created
+            ToDoList.create(
+                name=todolist_name,
+                callback=lambda todolist: self.on_todolist_saved(
+                    todolist, "List created successfully"
+                ),
+                error_callback=lambda error: self.show_snackbar(
+                    text="The list could not be created"
+                ),
+            )
 
         else:
-            self.todolist_to_update.update(name=todolist_name)
-            self.show_snackbar(text="Name modified successfully")
             todolist = self.todolist_to_update
+            todolist.update(
+                name=todolist_name,
+                callback=lambda updated: self.on_todolist_saved(
+                    todolist, "Name modified successfully"
+                ),
+                error_callback=lambda error: self.show_snackbar(
+                    text="The name could not be modified"
+                ),
+            )
+
+    def on_todolist_saved(self, todolist, text):
+        """Called once the to-do list is saved"""
+        self.show_snackbar(text=text)
+        self.open_todolist_detail(todolist)
 
-        # Setup the to-do list detail view and switch to it after creation
+    def open_todolist_detail(self, todolist):
+        """Setup the to-do list detail view and switch to it"""
         todolist_detail_screen = self.manager.get_screen("todolist-detail")
         todolist_detail_screen.todolist = todolist
         todolist_detail_screen.todolist_name = todolist.name
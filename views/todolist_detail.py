@@ -1,4 +1,4 @@
-from sqlalchemy import select, desc, asc, case
+from sqlalchemy import desc, asc, case, select
 
 from kivymd.app import MDApp
 from kivy.clock import Clock
@@ -27,21 +27,22 @@ from models.sector import Sector
 from models.todolist import ToDoList
 from views.ascent_list import DialogItem, DialogScrollableItem
 from models.todoclimb import ToDoClimb
-from models.grade import Grade
+from models.grade import Grade, grade_registry
+from views.selection import SelectableListMixin
+from views.snackbar import CustomSnackbar
 
 
-class ToDoListDetailScreen(MDScreen):
+class ToDoListDetailScreen(SelectableListMixin, MDScreen):
     """Screen for the list of ascents"""
 
+    recycleview_id = "climb_list"
+    rows_attribute = "climbs_data"
+
     todolist = ObjectProperty()
     todolist_id = NumericProperty(None)
     todolist_name = StringProperty("This is a very long list name")
     climbs_data = []
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        Clock.schedule_once(lambda dt: self.load_by_grade())
-
     def on_pre_enter(self):
         Clock.schedule_once(lambda *args: self.init_attributes())
         Clock.schedule_once(lambda *args: self.refresh_data())
@@ -52,68 +53,182 @@ class ToDoListDetailScreen(MDScreen):
 
     def load_climbs(self, ordered_query, group_label_getter):
         """
-        Load all of the ascents into a list (RecycleView)
+        Load all of the climbs into a list (RecycleView), with exactly one
+        query: the rows hold every displayed column, so no relationship is
+        loaded while the list is built.
 
         Parameters:
-        ordered_query: Query for the database, already ordered.
+        ordered_query: Query for the database (see ToDoClimb.list_query()),
+        already ordered.
         group_label_getter: Lambda function used to get the category label
-        values
+        values from a row of the query
         """
-        with MDApp.get_running_app().get_db_session() as session:
-            # Query the ascents with the right ordering requirement
-            climbs = session.scalars(ordered_query).all()
-            previous_group = None
-            self.climbs_data = []
-
-            for climb in climbs:
-                # Get the group of the new index of ascent.
-                current_group = group_label_getter(climb)
-                # If it is a new group, add the group to the ascent_data for
-                # display
-                if previous_group != current_group:
-                    self.climbs_data.append(
-                        {
-                            "id": 0,
-                            "name": str(current_group),
-                            "grade": "",
-                            "sector": "",
-                            "note": "",
-                            "tag": "",
-                            "star": False,
-                            "todolist_id": 0,
-                            "is_group": True,
-                        }
-                    )
-                    previous_group = current_group
-                # Add the ascent to the ascent_data for display in RecycleView
-                sector = climb.sector.name if climb.sector else ""
-                tag = climb.tag if climb.tag else ""
+        app = MDApp.get_running_app()
+        # Wait for the climbs just added or modified from the climb form
+        app.get_db_writer().flush()
+        with app.get_db_session() as session:
+            # Query the climbs with the right ordering requirement
+            rows = session.execute(ordered_query).all()
+
+        previous_group = None
+        self.climbs_data = []
+
+        for row in rows:
+            # Get the group of the new index of climb.
+            current_group = group_label_getter(row)
+            # If it is a new group, add the group to the climbs_data for
+            # display
+            if previous_group != current_group:
                 self.climbs_data.append(
                     {
-                        "id": climb.id,
-                        "name": climb.name,
-                        "grade": climb.grade.grade_value,
-                        "sector": sector,
-                        "tag": tag,
-                        "note": climb.note,
-                        "star": climb.star,
-                        "todolist_id": self.todolist_id,
-                        "is_group": False,
-                        "refresh_callback": self.refresh_recycleview,
+                        "id": 0,
+                        "name": str(current_group),
+                        "grade": "",
+                        "sector": "",
+                        "tag": "",
+                        "star": False,
+                        "todolist_id": 0,
+                        "is_group": True,
+                        "selected": False,
                     }
                 )
-
-            self.ids.climb_list.data = self.climbs_data
+                previous_group = current_group
+            # Add the climb to the climbs_data for display in RecycleView
+            self.climbs_data.append(
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "grade": row.grade_value,
+                    "sector": row.sector_name or "",
+                    "tag": row.tag or "",
+                    "star": row.star,
+                    "todolist_id": self.todolist_id,
+                    "is_group": False,
+                    "selected": False,
+                    "refresh_callback": self.refresh_recycleview,
+                    "selection_callback": self.select_row,
+                }
+            )
+
+        self.selected_count = 0
+        self.ids.climb_list.data = self.climbs_data
 
     def refresh_recycleview(self, popped_id):
         """Refresh the RecycleView when an ascent is deleted."""
-        # Pop the deleted ascent from the ascent_data list
-        self.climbs_data = [
-            ascent for ascent in self.climbs_data if ascent["id"] != popped_id
-        ]
-        # Update the data of the RecycleView with the ascent_data
-        self.ids.climb_list.data = self.climbs_data
-        self.ids.climb_list.refresh_from_data()
+        self.remove_rows([popped_id])
+
+    def bulk_delete(self):
+        """Delete all the selected climbs"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No climb selected")
+            return
+
+        def on_deleted(deleted):
+            self.remove_rows(ids)
+            self.show_snackbar(text=f"{deleted} climbs deleted")
+
+        def delete_climbs():
+            ToDoClimb.bulk_delete(
+                ids, callback=on_deleted, error_callback=self.on_bulk_error
+            )
+
+        self.show_bulk_delete_dialog(
+            f"Delete {len(ids)} climbs ?", delete_climbs
+        )
+
+    def bulk_move(self, item):
+        """Move all the selected climbs to another sector of the list"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No climb selected")
+            return
+        with MDApp.get_running_app().get_db_session() as session:
+            sectors = session.execute(
+                select(Sector.id, Sector.name)
+                .where(Sector.todolist_id == self.todolist_id)
+                .order_by(Sector.name)
+            ).all()
+        sectors = [(None, "Unassigned")] + [tuple(row) for row in sectors]
+        sector_names = dict(sectors)
+
+        def on_moved(sector_id):
+            # The sector groups of the list change: reload it
+            if self.ids.sort_by_sector.active:
+                self.refresh_data()
+            else:
+                sector = sector_names[sector_id] if sector_id else ""
+                self.patch_rows(ids, sector=sector)
+                self.clear_selection()
+
+        def move_climbs(sector_id):
+            ToDoClimb.bulk_update(
+                ids,
+                callback=lambda updated: on_moved(sector_id),
+                error_callback=self.on_bulk_error,
+                sector_id=sector_id,
+            )
+
+        self.open_bulk_menu(item, sectors, move_climbs)
+
+    def bulk_regrade(self, item):
+        """Change the grade of all the selected climbs"""
+        ids = self.get_selected_ids()
+        if not ids:
+            self.show_snackbar(text="No climb selected")
+            return
+
+        def on_regraded(grade_id):
+            # The grade groups of the list change: reload it
+            if self.ids.sort_by_grade.active:
+                self.refresh_data()
+            else:
+                self.patch_rows(
+                    ids,
+                    grade=grade_registry.get_by_id(grade_id).grade_value,
+                )
+                self.clear_selection()
+
+        def regrade_climbs(grade_id):
+            ToDoClimb.bulk_update(
+                ids,
+                callback=lambda updated: on_regraded(grade_id),
+                error_callback=self.on_bulk_error,
+                grade_id=grade_id,
+            )
+
+        self.open_bulk_menu(
+            item,
+            [(grade.id, grade.grade_value) for grade in grade_registry.all()],
+            regrade_climbs,
+        )
+
+    def bulk_toggle_star(self):
+        """
+        Star all the selected climbs, or unstar them if they all are starred
+        already
+        """
+        rows = self.get_selected_rows()
+        if not rows:
+            self.show_snackbar(text="No climb selected")
+            return
+        ids = [row["id"] for row in rows]
+        star = not all(row["star"] for row in rows)
+
+        def on_starred(updated):
+            self.patch_rows(ids, star=star)
+            self.clear_selection()
+
+        ToDoClimb.bulk_update(
+            ids,
+            callback=on_starred,
+            error_callback=self.on_bulk_error,
+            star=star,
+        )
+
+    def show_snackbar(self, text):
+        snackbar = CustomSnackbar(text=text)
+        snackbar.open()
 
     def refresh_data(self):
         if self.ids.sort_by_sector.active:
@@ -134,9 +249,7 @@ class ToDoListDetailScreen(MDScreen):
         # Call of load_ascent with the right lambda function
         self.load_climbs(
             ordered_query=query,
-            group_label_getter=lambda climb: (
-                climb.sector.name if climb.sector else "Unassigned"
-            ),
+            group_label_getter=lambda row: row.sector_name or "Unassigned",
         )
 
     def load_by_grade(self):
@@ -150,7 +263,7 @@ class ToDoListDetailScreen(MDScreen):
         # Call of load_ascent with the right lambda function
         self.load_climbs(
             ordered_query=query,
-            group_label_getter=lambda climb: climb.grade.grade_value,
+            group_label_getter=lambda row: row.grade_value,
         )
 
     def load_by_tag(self):
@@ -170,24 +283,24 @@ class ToDoListDetailScreen(MDScreen):
         # Call of load_ascent with the right lambda function
         self.load_climbs(
             ordered_query=query,
-            group_label_getter=lambda climb: (
-                climb.tag if climb.tag else "Untagged"
-            ),
+            group_label_getter=lambda row: row.tag or "Untagged",
         )
 
     def get_filtered_query(self):
-        """Get the base area filtered query for the database"""
-        query = (
-            select(ToDoClimb)
-            .where(ToDoClimb.todolist_id == self.todolist_id)
-            .join(ToDoClimb.grade)
-            .outerjoin(ToDoClimb.sector)
-        )
-        return query
+        """Get the base query of the climbs of the list for the database"""
+        return ToDoClimb.list_query(self.todolist_id)
 
     def delete_todolist(self):
-        ToDoList.delete(self.todolist_id)
-        self.manager.current = "todolist"
+        def back_to_todolists(result):
+            self.manager.current = "todolist"
+
+        ToDoList.delete(
+            self.todolist_id,
+            callback=back_to_todolists,
+            error_callback=lambda error: self.show_snackbar(
+                text="The list could not be deleted"
+            ),
+        )
 
     def update_todolist_name(self):
         todolist_add_screen = self.manager.get_screen("todolist-add")
@@ -249,16 +362,37 @@ class ClimbItem(MDBoxLayout):
     star = BooleanProperty()
     todolist_id = NumericProperty()
     is_group = BooleanProperty()
+    selected = BooleanProperty(False)
 
-    def __init__(self, refresh_callback=None, **kwargs):
+    def __init__(
+        self, refresh_callback=None, selection_callback=None, **kwargs
+    ):
         super().__init__(**kwargs)
         # refresh_callback is the update of the list when an item is deleted
         self.refresh_callback = refresh_callback
+        # selection_callback handles the clicks in selection mode
+        self.selection_callback = selection_callback
+
+    def on_name_release(self):
+        """Select the climb in selection mode, otherwise show its details"""
+        if self.is_group:
+            return
+        if self.selection_callback and self.selection_callback(self.id):
+            return
+        self.show_info_dialog()
 
     def delete_item(self):
         """Function to delete an Ascent from the list and from the database"""
-        ToDoClimb.delete(self.id)
-        self.refresh_callback(self.id)
+        # The item may be recycled for another row before the deletion ends
+        climb_id = self.id
+        refresh_callback = self.refresh_callback
+        ToDoClimb.delete(
+            climb_id,
+            callback=lambda result: refresh_callback(climb_id),
+            error_callback=lambda error: CustomSnackbar(
+                text="The climb could not be deleted"
+            ).open(),
+        )
 
     def show_info_dialog(self):
         """Show a dialog window with full details of an ascent when the name of
@@ -268,7 +402,9 @@ class ClimbItem(MDBoxLayout):
 
         app = MDApp.get_running_app()
 
-        self.note = self.note if self.note else " "
+        # The note is not part of the list data, it is only loaded here
+        climb = ToDoClimb.get_from_id(self.id)
+        self.note = climb.note if climb and climb.note else " "
         self.tag = self.tag if self.tag else " "
         self.sector = self.sector if self.sector else " "
 